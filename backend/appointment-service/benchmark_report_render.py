@@ -0,0 +1,58 @@
+"""
+Report Rendering Benchmark
+Compares per-render time of the vehicle inspection report:
+- before: styles rebuilt for every render (getSampleStyleSheet, ParagraphStyle, TableStyle)
+- after: styles taken from the registry built once at import
+
+Usage: python benchmark_report_render.py [renders]
+"""
+
+import sys
+import time
+from datetime import datetime
+
+import main
+
+VEHICLE_INFO = {"type": "car", "registration": "AB-123-CD", "brand": "Renault", "model": "Clio"}
+INSPECTION = {
+    "id": "3f0c9a52-6a8e-4d8c-9d1f-2b7f5e6c1a90",
+    "results": {
+        "brakes": "PASS", "lights": "PASS", "tires": "FAIL", "emissions": "PASS",
+        "suspension": "PASS", "steering": "PASS", "bodywork": "PASS", "windshield": "PASS"
+    },
+    "notes": "Front left tire below legal tread depth."
+}
+
+def render():
+    return main.render_vehicle_report_pdf(
+        VEHICLE_INFO, datetime(2026, 1, 5, 9, 0), "passed_with_minor_issues", INSPECTION, datetime.utcnow()
+    )
+
+def render_with_fresh_styles():
+    main.report_styles = main.build_report_styles()
+    return render()
+
+def time_per_render(fn, renders: int) -> float:
+    """Mean milliseconds per call after one warm-up call"""
+    fn()
+    start = time.perf_counter()
+    for _ in range(renders):
+        fn()
+    return (time.perf_counter() - start) * 1000 / renders
+
+def run_benchmark(renders: int):
+    registry = main.report_styles
+
+    styles_ms = time_per_render(main.build_report_styles, renders)
+    before_ms = time_per_render(render_with_fresh_styles, renders)
+    main.report_styles = registry
+    after_ms = time_per_render(render, renders)
+
+    print(f"Renders per variant:          {renders}")
+    print(f"Style construction alone:     {styles_ms:.3f} ms")
+    print(f"Before (styles per render):   {before_ms:.3f} ms/render")
+    print(f"After (shared registry):      {after_ms:.3f} ms/render")
+    print(f"Saved per render:             {before_ms - after_ms:.3f} ms ({(before_ms - after_ms) / before_ms * 100:.1f}%)")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
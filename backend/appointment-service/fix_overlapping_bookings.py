@@ -0,0 +1,83 @@
+"""
+Overlapping Bookings Data Fix
+Before the exclusion constraint appointments_no_lane_overlap only identical start
+times were rejected, so an existing database can hold active (pending/confirmed)
+bookings whose 45-minute windows overlap. The constraint cannot be added on top of
+them and the service refuses to start without it.
+
+This script re-spreads active bookings over the INSPECTION_LANES lanes (earliest
+start first, lowest free lane) and lists the bookings that fit in no lane.
+With --apply it writes the new lanes and cancels the bookings that do not fit
+(the later-created of each clash) and rebuilds lane occupancy and counts to match. Restart
+the service afterwards: startup adds the constraint.
+
+Uses the DB_* settings of the service (.env).
+Usage: python fix_overlapping_bookings.py [--apply]
+"""
+
+import asyncio
+import asyncpg
+import sys
+from datetime import timedelta
+
+import main
+
+async def fix_overlapping_bookings(apply: bool):
+    conn = await asyncpg.connect(
+        host=main.DB_HOST,
+        port=main.DB_PORT,
+        user=main.DB_USER,
+        password=main.DB_PASSWORD,
+        database=main.DB_NAME
+    )
+    try:
+        bookings = await conn.fetch("""
+            SELECT id, appointment_date, ends_at, lane, created_at, vehicle_info ->> 'registration' AS registration
+            FROM appointments
+            WHERE appointment_date IS NOT NULL AND status IN ('pending', 'confirmed')
+            ORDER BY appointment_date, created_at
+        """)
+        print(f"✓ {len(bookings)} active bookings, {main.INSPECTION_LANES} lane(s)")
+        
+        lane_free_at = [None] * main.INSPECTION_LANES
+        moved, unplaced = [], []
+        for booking in bookings:
+            start = booking["appointment_date"]
+            end = booking["ends_at"] or start + timedelta(minutes=main.SLOT_DURATION_MINUTES)
+            lane = next((i for i, free_at in enumerate(lane_free_at) if free_at is None or free_at <= start), None)
+            if lane is None:
+                unplaced.append(booking)
+                continue
+            lane_free_at[lane] = end
+            if lane != booking["lane"]:
+                moved.append((booking["id"], lane))
+        
+        print(f"✓ {len(moved)} bookings change lane")
+        print(f"{'✗' if unplaced else '✓'} {len(unplaced)} bookings fit in no lane")
+        for booking in unplaced:
+            print(f"  {booking['id']}  {booking['appointment_date']:%Y-%m-%d %H:%M}  {booking['registration']}  (created {booking['created_at']:%Y-%m-%d %H:%M})")
+        
+        if not apply:
+            print("\nDry run - rerun with --apply to write these changes")
+            return
+        
+        async with conn.transaction():
+            await conn.executemany("UPDATE appointments SET lane = $2 WHERE id = $1", moved)
+            await conn.executemany(
+                "UPDATE appointments SET status = 'cancelled', updated_at = now() AT TIME ZONE 'utc' WHERE id = $1",
+                [(booking["id"],) for booking in unplaced]
+            )
+    finally:
+        await conn.close()
+    
+    await main.rebuild_slot_occupancy()
+    await main.rebuild_appointment_counts()
+    await main.engine.dispose()
+    print("\n✓ Applied - restart appointment-service to add the constraint")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(fix_overlapping_bookings("--apply" in sys.argv[1:]))
+    except Exception as e:
+        print(f"\n✗ Data fix failed: {e}")
+        sys.exit(1)
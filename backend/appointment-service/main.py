@@ -4,20 +4,31 @@ Port: 8002
 Database: appointments_db
 """
 
-from fastapi import FastAPI, HTTPException, Header, status, Depends
+from fastapi import FastAPI, HTTPException, Header, Query, Request, status, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, validator
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, validator
 import jwt
 import os
-from datetime import datetime, timedelta, date
-from typing import Optional, List, AsyncGenerator
+import asyncpg
+from datetime import datetime, timedelta, date, time
+from typing import Optional, List, Dict, Tuple, Union, Callable, Awaitable, AsyncGenerator
 import logging
 from dotenv import load_dotenv
 import httpx
 from enum import Enum
 import uuid
 import io
+import csv
+import json
+import base64
+import hashlib
+import bisect
+import asyncio
+from time import monotonic
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -28,8 +39,9 @@ from reportlab.pdfgen import canvas
 # SQLAlchemy imports
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column
-from sqlalchemy import String, DateTime, select, JSON
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import String, DateTime, Date, BigInteger, SmallInteger, Index, select, delete, exists, func, text, tuple_, literal_column
+from sqlalchemy.dialects.postgresql import UUID, JSONB, insert as pg_insert
 
 load_dotenv()
 
@@ -49,6 +61,10 @@ LOGGING_SERVICE_URL = os.getenv("LOGGING_SERVICE_URL", "http://localhost:8005")
 PAYMENT_SERVICE_URL = os.getenv("PAYMENT_SERVICE_URL", "http://localhost:8003")
 INSPECTION_SERVICE_URL = os.getenv("INSPECTION_SERVICE_URL", "http://localhost:8004")
 
+# Upper bound on IDs accepted by batch lookups
+MAX_BATCH_SIZE = 500
+MAX_BULK_APPOINTMENTS = int(os.getenv("MAX_BULK_APPOINTMENTS", "100"))
+
 # SQLAlchemy Database URL
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
@@ -71,18 +87,21 @@ class AppointmentStatus(str, Enum):
     COMPLETED = "completed"
     CANCELLED = "cancelled"
 
+VEHICLE_TYPES = ["car", "motorcycle", "truck", "van"]
+COMPLETED_INSPECTION_STATUSES = ["passed", "failed", "passed_with_minor_issues"]
+
 class AppointmentRequest(BaseModel):
+    # Bounded so vehicle_info, and with it every appointment event, stays small (see appointment_snapshot)
     vehicle_type: str
-    vehicle_registration: str
-    vehicle_brand: str
-    vehicle_model: str
+    vehicle_registration: str = Field(max_length=20)
+    vehicle_brand: str = Field(max_length=50)
+    vehicle_model: str = Field(max_length=50)
     appointment_date: Optional[str] = None
     
     @validator("vehicle_type")
     def validate_vehicle_type(cls, v):
-        valid_types = ["car", "motorcycle", "truck", "van"]
-        if v not in valid_types:
-            raise ValueError(f"Vehicle type must be one of {valid_types}")
+        if v not in VEHICLE_TYPES:
+            raise ValueError(f"Vehicle type must be one of {VEHICLE_TYPES}")
         return v.lower()
     
     @validator("vehicle_registration")
@@ -100,6 +119,31 @@ class AppointmentResponse(BaseModel):
     created_at: str
     appointment_date: Optional[str]
 
+class AppointmentPage(BaseModel):
+    items: List[AppointmentResponse]
+    next_cursor: Optional[str]
+
+class AppointmentBatchRequest(BaseModel):
+    appointment_ids: List[str]
+    
+    @validator("appointment_ids")
+    def batch_size_valid(cls, v):
+        if len(v) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} appointment IDs per request")
+        return v
+
+class BulkAppointmentRequest(BaseModel):
+    appointments: List[AppointmentRequest]
+    partial: bool = False  # Book what fits instead of rejecting the whole batch on a conflict
+    
+    @validator("appointments")
+    def bulk_size_valid(cls, v):
+        if not v:
+            raise ValueError("At least one appointment is required")
+        if len(v) > MAX_BULK_APPOINTMENTS:
+            raise ValueError(f"At most {MAX_BULK_APPOINTMENTS} appointments per request")
+        return v
+
 class AppointmentUpdate(BaseModel):
     payment_id: str
     status: str = "confirmed"
@@ -109,10 +153,25 @@ Base = declarative_base()
 
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (
+        # Keyset pagination walks these backwards: ORDER BY created_at DESC, id DESC
+        Index("ix_appointments_created_at_id", "created_at", "id"),
+        Index("ix_appointments_user_created_at_id", "user_id", "created_at", "id"),
+        # Availability reads: active bookings in a date range (partial, matches ACTIVE_BOOKING)
+        Index("ix_appointments_active_date", "appointment_date", postgresql_where=text("status IN ('pending', 'confirmed')")),
+        Index("ix_appointments_date_status", "appointment_date", "status"),
+        # /appointments/all?status=... newest first, offset or keyset
+        Index("ix_appointments_status_created_at_id", "status", "created_at", "id"),
+        # Plate lookups and brand/model containment (@>) for /appointments/search
+        Index("ix_appointments_registration", text("(vehicle_info ->> 'registration')")),
+        Index("ix_appointments_vehicle_info", "vehicle_info", postgresql_using="gin", postgresql_ops={"vehicle_info": "jsonb_path_ops"}),
+        # /appointments/changes walks forwards: ORDER BY updated_at, id
+        Index("ix_appointments_updated_at_id", "updated_at", "id"),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False, index=True)
-    vehicle_info: Mapped[dict] = mapped_column(JSON, nullable=False)
+    vehicle_info: Mapped[dict] = mapped_column(JSONB, nullable=False)
     status: Mapped[str] = mapped_column(String(50), nullable=False, default="pending", index=True)
     payment_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), nullable=True)
     appointment_date: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
@@ -121,6 +180,32 @@ class Appointment(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     idempotency_key: Mapped[Optional[str]] = mapped_column(String(255), nullable=True, unique=True)
+    lane: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0, server_default="0")  # Inspection lane the booking was allocated to
+    ends_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # appointment_date + duration for the vehicle type
+
+class LaneOccupancy(Base):
+    """Precomputed availability: one row per day and lane, bit i set when slot i of that lane is taken"""
+    __tablename__ = "lane_occupancy"
+    
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    lane: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    booked_mask: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AppointmentCount(Base):
+    """Number of appointments per (status, inspection_status), updated with every insert and transition"""
+    __tablename__ = "appointment_counts"
+    
+    status: Mapped[str] = mapped_column(String(50), primary_key=True)
+    inspection_status: Mapped[str] = mapped_column(String(50), primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+class AppointmentVersion(Base):
+    """Single-row change counter bumped in every transaction that writes appointments - the listings' ETag marker"""
+    __tablename__ = "appointment_version"
+    
+    id: Mapped[int] = mapped_column(SmallInteger, primary_key=True, default=1)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
 
 # SQLAlchemy Engine and Session
 engine = create_async_engine(
@@ -145,6 +230,53 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         finally:
             await session.close()
 
+# SQLSTATE raised when a row violates an EXCLUDE constraint
+EXCLUSION_VIOLATION = "23P01"
+
+def schema_upgrades() -> List[str]:
+    """DDL that create_all cannot apply to tables that already exist"""
+    return [
+        "CREATE EXTENSION IF NOT EXISTS btree_gist",
+        "ALTER TABLE appointments ADD COLUMN IF NOT EXISTS lane SMALLINT NOT NULL DEFAULT 0",
+        "ALTER TABLE appointments ADD COLUMN IF NOT EXISTS ends_at TIMESTAMP",
+        f"""
+        UPDATE appointments SET ends_at = appointment_date + interval '{SLOT_DURATION_MINUTES} minutes'
+        WHERE ends_at IS NULL AND appointment_date IS NOT NULL
+        """,
+        # Replaced by lane_occupancy
+        "DROP TABLE IF EXISTS slot_occupancy",
+        # Two active bookings in the same lane may never overlap: the database rejects the second INSERT
+        """
+        DO $$
+        BEGIN
+            ALTER TABLE appointments DROP CONSTRAINT IF EXISTS appointments_no_overlap;
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'appointments_no_lane_overlap') THEN
+                ALTER TABLE appointments ADD CONSTRAINT appointments_no_lane_overlap
+                    EXCLUDE USING gist (lane WITH =, tsrange(appointment_date, ends_at) WITH &&)
+                    WHERE (appointment_date IS NOT NULL AND status IN ('pending', 'confirmed'));
+            END IF;
+        END $$;
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_appointments_created_at_id ON appointments (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_appointments_user_created_at_id ON appointments (user_id, created_at, id)",
+        # vehicle_info was created as JSON, which can be neither indexed nor compared
+        """
+        DO $$
+        BEGIN
+            IF (SELECT data_type FROM information_schema.columns
+                WHERE table_name = 'appointments' AND column_name = 'vehicle_info') = 'json' THEN
+                ALTER TABLE appointments ALTER COLUMN vehicle_info TYPE JSONB USING vehicle_info::jsonb;
+            END IF;
+        END $$;
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_appointments_active_date ON appointments (appointment_date) WHERE status IN ('pending', 'confirmed')",
+        "CREATE INDEX IF NOT EXISTS ix_appointments_date_status ON appointments (appointment_date, status)",
+        "CREATE INDEX IF NOT EXISTS ix_appointments_status_created_at_id ON appointments (status, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_appointments_registration ON appointments ((vehicle_info ->> 'registration'))",
+        "CREATE INDEX IF NOT EXISTS ix_appointments_vehicle_info ON appointments USING gin (vehicle_info jsonb_path_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_appointments_updated_at_id ON appointments (updated_at, id)",
+    ]
+
 async def init_db():
     """Initialize database tables"""
     try:
@@ -154,6 +286,24 @@ async def init_db():
     except Exception as e:
         logger.error(f"✗ Failed to initialize database: {e}")
         raise
+    
+    for ddl in schema_upgrades():
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(ddl))
+        except Exception as e:
+            logger.error(f"✗ Failed to apply schema upgrade: {e}")
+    
+    # Bookings are only checked for overlap by this constraint - never serve without it
+    async with engine.connect() as conn:
+        constraint = await conn.scalar(
+            text("SELECT 1 FROM pg_constraint WHERE conname = 'appointments_no_lane_overlap'")
+        )
+    if not constraint:
+        raise RuntimeError(
+            "Constraint appointments_no_lane_overlap is missing - existing active bookings overlap in a lane. "
+            "Run fix_overlapping_bookings.py (see DEPLOYMENT_GUIDE.md) and restart."
+        )
 
 # ============= HELPERS =============
 async def log_event(service: str, event: str, level: str, message: str):
@@ -186,16 +336,977 @@ def verify_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+# ============= CACHING =============
+AVAILABILITY_CACHE_TTL_SECONDS = float(os.getenv("AVAILABILITY_CACHE_TTL_SECONDS", "30"))
+AVAILABILITY_CACHE_MAX_DAYS = int(os.getenv("AVAILABILITY_CACHE_MAX_DAYS", "512"))
+AVAILABILITY_CHANNEL = "availability_changed"
+
+class AvailabilityCache:
+    """Per-worker LRU of per-day lane occupancy masks with a short TTL"""
+    
+    def __init__(self, max_days: int, ttl_seconds: float):
+        self.max_days = max_days
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[date, Tuple[float, Dict[int, int]]]" = OrderedDict()
+        # Bumped on every invalidation so a read that raced with a write is never stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, day: date) -> Optional[Dict[int, int]]:
+        entry = self._entries.get(day)
+        if entry is None or monotonic() - entry[0] > self.ttl_seconds:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(day)
+        self.hits += 1
+        return entry[1]
+    
+    def put(self, day: date, lane_masks: Dict[int, int], generation: int):
+        if generation != self.generation:
+            return
+        self._entries[day] = (monotonic(), lane_masks)
+        self._entries.move_to_end(day)
+        while len(self._entries) > self.max_days:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, day: Optional[date] = None):
+        """Drop one day, or everything when day is None"""
+        self.generation += 1
+        self.invalidations += 1
+        if day is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(day, None)
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_days": self.max_days,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+availability_cache = AvailabilityCache(AVAILABILITY_CACHE_MAX_DAYS, AVAILABILITY_CACHE_TTL_SECONDS)
+
+class SingleFlight:
+    """Let concurrent identical reads in this worker share one in-flight computation"""
+    
+    def __init__(self):
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+    
+    async def do(self, key: Tuple, compute: Callable[[], Awaitable]):
+        """Await compute() or join an identical call already running for key"""
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        # Shielded so one caller disconnecting does not cancel the work the others are waiting on
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: Tuple, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved even if every waiter went away
+    
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced
+        }
+
+single_flight = SingleFlight()
+
+async def in_own_session(work: Callable[[AsyncSession], Awaitable]):
+    """Run work with a dedicated session, for computations shared between requests"""
+    async with async_session_maker() as session:
+        return await work(session)
+
+async def notify(db: AsyncSession, channel: str, payload: str):
+    """Queue a PostgreSQL NOTIFY - delivered to every listening worker when the transaction commits"""
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+
+async def invalidate_availability(db: AsyncSession, appointment_date: Optional[datetime]):
+    """Drop a day from this worker's cache now and from every worker's cache on commit"""
+    if not appointment_date:
+        return
+    availability_cache.invalidate(appointment_date.date())
+    await notify(db, AVAILABILITY_CHANNEL, appointment_date.date().isoformat())
+
+def on_availability_changed(payload: str):
+    try:
+        availability_cache.invalidate(date.fromisoformat(payload))
+    except ValueError:
+        availability_cache.invalidate()
+
+APPOINTMENT_EVENTS_CHANNEL = "appointment_events"
+NOTIFY_PAYLOAD_LIMIT = 8000  # PostgreSQL rejects NOTIFY payloads of this many bytes or more
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+class EventBroker:
+    """Fan appointment events out to this worker's SSE subscribers, one bounded queue each"""
+    
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers: set = set()
+        self.published = 0
+        self.dropped = 0
+    
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+    
+    def publish(self, payload: str):
+        """NOTIFY handler: payload is the JSON event written by publish_appointment_event"""
+        event = json.loads(payload)
+        self.published += 1
+        for queue in list(self._subscribers):
+            self._offer(queue, event)
+    
+    def resync(self):
+        """Events may have been missed (listener reconnected): subscribers should reload their lists"""
+        for queue in list(self._subscribers):
+            self._offer(queue, {"type": "resync"})
+    
+    def _offer(self, queue: asyncio.Queue, event: dict):
+        if queue.full():
+            # Slow client: swap its backlog for one resync rather than block the listener or grow memory
+            self.dropped += queue.qsize() + 1
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({"type": "resync"})
+            return
+        queue.put_nowait(event)
+    
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped
+        }
+
+event_broker = EventBroker(SSE_QUEUE_SIZE)
+
+def appointment_snapshot(a: "Appointment") -> dict:
+    """
+    What an SSE event carries about an appointment. A few hundred bytes for bookings made through
+    AppointmentRequest; vehicle_info of older rows is unbounded, see publish_appointment_event.
+    """
+    return {
+        "id": str(a.id),
+        "user_id": str(a.user_id),
+        "vehicle_info": a.vehicle_info,
+        "appointment_date": a.appointment_date.isoformat() if a.appointment_date else None,
+        "ends_at": a.ends_at.isoformat() if a.ends_at else None,
+        "lane": a.lane,
+        "status": a.status,
+        "inspection_status": a.inspection_status,
+        "created_at": a.created_at.isoformat() if a.created_at else None,
+        "updated_at": a.updated_at.isoformat() if a.updated_at else None
+    }
+
+async def publish_appointment_event(db: AsyncSession, event_type: str, appointment: "Appointment"):
+    """
+    Queue a slot_taken / slot_freed / status_changed event for every worker's SSE subscribers on commit.
+    Every appointment write goes through here, so it also bumps the ETag version (always the last lock taken).
+    """
+    payload = json.dumps({"type": event_type, "appointment": appointment_snapshot(appointment)})
+    if len(payload.encode()) >= NOTIFY_PAYLOAD_LIMIT:
+        # Too big to NOTIFY: tell subscribers to re-read instead (/appointments/changes has the full row)
+        logger.warning(f"Appointment {appointment.id} event is {len(payload.encode())} bytes, publishing a resync instead")
+        payload = json.dumps({"type": "resync"})
+    await notify(db, APPOINTMENT_EVENTS_CHANNEL, payload)
+    await bump_appointments_version(db)
+
+# Channel -> handler(payload) for the shared LISTEN connection
+NOTIFY_HANDLERS: Dict[str, Callable[[str], None]] = {
+    AVAILABILITY_CHANNEL: on_availability_changed,
+    APPOINTMENT_EVENTS_CHANNEL: event_broker.publish,
+}
+
+async def notification_listener():
+    """Keep one LISTEN connection open per worker and dispatch notifications to NOTIFY_HANDLERS"""
+    def dispatch(connection, pid, channel, payload):
+        try:
+            NOTIFY_HANDLERS[channel](payload)
+        except Exception as e:
+            logger.warning(f"Notification handler for {channel} failed: {e}")
+    
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(
+                host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASSWORD, database=DB_NAME
+            )
+            for channel in NOTIFY_HANDLERS:
+                await conn.add_listener(channel, dispatch)
+            # Anything may have changed while we were not listening
+            availability_cache.invalidate()
+            event_broker.resync()
+            logger.info(f"✓ Listening for notifications on {', '.join(NOTIFY_HANDLERS)}")
+            while not conn.is_closed():
+                await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            if conn and not conn.is_closed():
+                await conn.close()
+            raise
+        except Exception as e:
+            logger.warning(f"Notification listener error: {e}")
+        availability_cache.invalidate()
+        await asyncio.sleep(5)
+
+# ============= SCHEDULING =============
+# Capacity model: the day is cut into fixed slots, every lane inspects one vehicle at a time,
+# and a vehicle type may need several consecutive slots in the same lane.
+# WORKING_HOURS format: "mon-fri=09:00-17:00,sat=09:00-13:00" (days not listed are closed)
+# VEHICLE_SLOT_MINUTES format: "truck=90,van=60" (types not listed take one slot)
+SLOT_DURATION_MINUTES = int(os.getenv("SLOT_DURATION_MINUTES", "45"))
+INSPECTION_LANES = int(os.getenv("INSPECTION_LANES", "1"))
+WORKING_HOURS = os.getenv("WORKING_HOURS", "mon-sun=09:00-17:00")
+VEHICLE_SLOT_MINUTES = os.getenv("VEHICLE_SLOT_MINUTES", "")
+ACTIVE_STATUSES = [AppointmentStatus.PENDING.value, AppointmentStatus.CONFIRMED.value]
+WEEKDAY_NAMES = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+# status IN ('pending', 'confirmed') with the values inlined: the same predicate as
+# ix_appointments_active_date, so the partial index still applies to generic (prepared) plans
+ACTIVE_BOOKING = Appointment.status.in_([literal_column(f"'{status}'") for status in ACTIVE_STATUSES])
+
+# Next-available search reads occupancy in chunks of days and gives up after the horizon
+NEXT_AVAILABLE_CHUNK_DAYS = 14
+NEXT_AVAILABLE_HORIZON_DAYS = int(os.getenv("NEXT_AVAILABLE_HORIZON_DAYS", "90"))
+
+# lane_occupancy.booked_mask is a signed BIGINT: one bit per slot leaves room for 63
+MAX_SLOTS_PER_DAY = 63
+
+def parse_working_hours(spec: str) -> Dict[int, Tuple[time, time]]:
+    """Map weekday index (0 = Monday) to its opening and closing time"""
+    hours = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            days, span = entry.split("=")
+            first, _, last = days.strip().lower().partition("-")
+            opens, closes = (datetime.strptime(t.strip(), "%H:%M").time() for t in span.split("-"))
+        except ValueError:
+            raise ValueError(f"WORKING_HOURS entry '{entry}' is not like mon-fri=09:00-17:00") from None
+        unknown = [day for day in (first, last or first) if day not in WEEKDAY_NAMES]
+        if unknown:
+            raise ValueError(f"WORKING_HOURS entry '{entry}': unknown weekday {unknown[0]!r}, expected one of {WEEKDAY_NAMES}")
+        if opens >= closes:
+            raise ValueError(f"WORKING_HOURS entry '{entry}': closing time must be after opening time")
+        for weekday in range(WEEKDAY_NAMES.index(first), WEEKDAY_NAMES.index(last or first) + 1):
+            hours[weekday] = (opens, closes)
+    return hours
+
+def parse_vehicle_slots(spec: str) -> Dict[str, int]:
+    """Number of consecutive slots each vehicle type occupies"""
+    units = {vehicle_type: 1 for vehicle_type in VEHICLE_TYPES}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        vehicle_type, minutes = entry.split("=")
+        units[vehicle_type.strip().lower()] = max(1, -(-int(minutes) // SLOT_DURATION_MINUTES))
+    return units
+
+OPENING_HOURS = parse_working_hours(WORKING_HOURS)
+VEHICLE_SLOT_UNITS = parse_vehicle_slots(VEHICLE_SLOT_MINUTES)
+
+def describe_working_hours() -> str:
+    """Human readable opening hours, e.g. 09:00 - 17:00 or Mon-Fri 09:00 - 17:00, Sat 09:00 - 13:00"""
+    groups = []
+    for weekday in range(7):
+        span = OPENING_HOURS.get(weekday)
+        if groups and groups[-1][2] == span and groups[-1][1] == weekday - 1:
+            groups[-1][1] = weekday
+        else:
+            groups.append([weekday, weekday, span])
+    groups = [g for g in groups if g[2]]
+    if len(groups) == 1 and groups[0][:2] == [0, 6]:
+        return f"{groups[0][2][0]:%H:%M} - {groups[0][2][1]:%H:%M}"
+    return ", ".join(
+        (WEEKDAY_NAMES[first].title() + (f"-{WEEKDAY_NAMES[last].title()}" if last != first else ""))
+        + f" {opens:%H:%M} - {closes:%H:%M}"
+        for first, last, (opens, closes) in groups
+    )
+
+def slot_units(vehicle_type: Optional[str]) -> int:
+    """Slots needed by a vehicle type (one slot when unknown)"""
+    return VEHICLE_SLOT_UNITS.get((vehicle_type or "").lower(), 1)
+
+def booking_duration(vehicle_type: Optional[str]) -> timedelta:
+    return timedelta(minutes=SLOT_DURATION_MINUTES * slot_units(vehicle_type))
+
+def requested_slot_units(vehicle_type: Optional[str]) -> int:
+    """Slot units for an optional vehicle_type query parameter, rejecting unknown types"""
+    if vehicle_type and vehicle_type.lower() not in VEHICLE_TYPES:
+        raise HTTPException(status_code=400, detail=f"Vehicle type must be one of {VEHICLE_TYPES}")
+    return slot_units(vehicle_type)
+
+def day_slot_times(day: date) -> List[datetime]:
+    """Start times of every bookable slot on a given day"""
+    hours = OPENING_HOURS.get(day.weekday())
+    if not hours:
+        return []
+    slots = []
+    current_time = datetime.combine(day, hours[0])
+    end_time = datetime.combine(day, hours[1])
+    while current_time < end_time:
+        slots.append(current_time)
+        current_time += timedelta(minutes=SLOT_DURATION_MINUTES)
+    return slots
+
+def check_slots_per_day():
+    """Refuse a WORKING_HOURS / SLOT_DURATION_MINUTES combination whose days do not fit the occupancy mask"""
+    if SLOT_DURATION_MINUTES < 1:
+        raise RuntimeError(f"SLOT_DURATION_MINUTES must be positive, got {SLOT_DURATION_MINUTES}")
+    monday = date(2024, 1, 1)
+    for weekday in sorted(OPENING_HOURS):
+        slots = len(day_slot_times(monday + timedelta(days=weekday)))
+        if slots > MAX_SLOTS_PER_DAY:
+            raise RuntimeError(
+                f"{WEEKDAY_NAMES[weekday]} has {slots} slots of {SLOT_DURATION_MINUTES} minutes, "
+                f"at most {MAX_SLOTS_PER_DAY} fit the occupancy mask - shorten WORKING_HOURS or raise SLOT_DURATION_MINUTES"
+            )
+
+check_slots_per_day()
+
+def interval_mask(day: date, start: datetime, end: datetime) -> int:
+    """Bitmask of the slots on a day whose window overlaps [start, end)"""
+    slot_times = day_slot_times(day)
+    window = timedelta(minutes=SLOT_DURATION_MINUTES)
+    # Slot i overlaps when slot_times[i] + window > start and slot_times[i] < end
+    first = bisect.bisect_right(slot_times, start - window)
+    last = bisect.bisect_left(slot_times, end)
+    if first >= last:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+def allocate_lane(lane_masks: Dict[int, int], need_mask: int, exclude: Optional[set] = None) -> Optional[int]:
+    """First lane with every slot in need_mask free, or None when the station is full"""
+    for lane in range(INSPECTION_LANES):
+        if exclude and lane in exclude:
+            continue
+        if not lane_masks.get(lane, 0) & need_mask:
+            return lane
+    return None
+
+def remaining_capacity(lane_masks: Dict[int, int], slot_index: int) -> int:
+    """Number of lanes still free in a slot"""
+    busy = sum((lane_masks.get(lane, 0) >> slot_index) & 1 for lane in range(INSPECTION_LANES))
+    return INSPECTION_LANES - busy
+
+def slot_fits(lane_masks: Dict[int, int], slot_index: int, total_slots: int, units: int) -> bool:
+    """Whether a vehicle needing `units` consecutive slots can start at slot_index in some lane"""
+    if slot_index + units > total_slots:
+        return False
+    return allocate_lane(lane_masks, ((1 << units) - 1) << slot_index) is not None
+
+def bookings_query(range_start: datetime, range_end: datetime):
+    return (
+        select(Appointment.appointment_date, Appointment.ends_at, Appointment.lane)
+        .where(
+            Appointment.appointment_date >= range_start,
+            Appointment.appointment_date < range_end,
+            ACTIVE_BOOKING
+        )
+        .order_by(Appointment.appointment_date)
+    )
+
+async def fetch_bookings(db: AsyncSession, start_day: date, days: int) -> List[Tuple[datetime, datetime, int]]:
+    """(start, end, lane) of active bookings starting in [start_day, start_day + days) - one range query"""
+    range_start = datetime.combine(start_day, datetime.min.time())
+    result = await db.execute(bookings_query(range_start, range_start + timedelta(days=days)))
+    window = timedelta(minutes=SLOT_DURATION_MINUTES)
+    return [(start, end or start + window, lane) for start, end, lane in result.all()]
+
+def lane_masks_for(bookings: List[Tuple[datetime, datetime, int]]) -> Dict[date, Dict[int, int]]:
+    """Fold bookings into per-day, per-lane occupancy masks"""
+    masks = {}
+    for start, end, lane in bookings:
+        day_masks = masks.setdefault(start.date(), {})
+        day_masks[lane] = day_masks.get(lane, 0) | interval_mask(start.date(), start, end)
+    return masks
+
+def build_day_schedule(day: date, lane_masks: Dict[int, int], units: int = 1) -> dict:
+    """Slot availability for one day from its per-lane occupancy masks"""
+    slot_times = day_slot_times(day)
+    slots = [
+        {
+            "time": slot_time.isoformat(),
+            "display": slot_time.strftime("%H:%M"),
+            "available": slot_fits(lane_masks, i, len(slot_times), units),
+            "remaining_capacity": remaining_capacity(lane_masks, i)
+        }
+        for i, slot_time in enumerate(slot_times)
+    ]
+    hours = OPENING_HOURS.get(day.weekday())
+    return {
+        "date": day.isoformat(),
+        "day_name": day.strftime("%A"),
+        "working_hours": f"{hours[0]:%H:%M} - {hours[1]:%H:%M}" if hours else None,
+        "slots": slots,
+        "total_slots": len(slots),
+        "available_count": sum(1 for s in slots if s["available"])
+    }
+
+def occupancy_query(start_day: date, days: int):
+    """Per-lane occupancy masks for [start_day, start_day + days) - one primary key range read"""
+    return select(LaneOccupancy.day, LaneOccupancy.lane, LaneOccupancy.booked_mask).where(
+        LaneOccupancy.day >= start_day,
+        LaneOccupancy.day < start_day + timedelta(days=days)
+    )
+
+async def fetch_occupancy(db: AsyncSession, start_day: date, days: int) -> Dict[date, Dict[int, int]]:
+    """Occupancy masks by day and lane, see occupancy_query"""
+    result = await db.execute(occupancy_query(start_day, days))
+    masks = {}
+    for row in result.all():
+        masks.setdefault(row.day, {})[row.lane] = row.booked_mask
+    return masks
+
+async def cached_occupancy(db: AsyncSession, start_day: date, days: int) -> Dict[date, Dict[int, int]]:
+    """fetch_occupancy served from the availability cache, reading the range once if any day is missing"""
+    day_list = [start_day + timedelta(days=offset) for offset in range(days)]
+    cached = {day: availability_cache.get(day) for day in day_list}
+    if all(masks is not None for masks in cached.values()):
+        return cached
+    generation = availability_cache.generation
+    masks = await fetch_occupancy(db, start_day, days)
+    for day in day_list:
+        availability_cache.put(day, masks.get(day, {}), generation)
+    return masks
+
+async def load_schedule(db: AsyncSession, start_day: date, days: int, units: int = 1) -> List[dict]:
+    """Availability for consecutive days, shared by available-slots, weekly-schedule and calendar"""
+    masks = await cached_occupancy(db, start_day, days)
+    return [
+        build_day_schedule(day, masks.get(day, {}), units)
+        for day in (start_day + timedelta(days=offset) for offset in range(days))
+    ]
+
+async def find_free_slots(db: AsyncSession, from_time: datetime, count: int, units: int = 1) -> List[datetime]:
+    """First `count` free slot start times at or after from_time, scanning forward chunk by chunk"""
+    found = []
+    chunk_start = from_time.date()
+    horizon = chunk_start + timedelta(days=NEXT_AVAILABLE_HORIZON_DAYS)
+    while chunk_start < horizon and len(found) < count:
+        chunk_days = min(NEXT_AVAILABLE_CHUNK_DAYS, (horizon - chunk_start).days)
+        masks = await fetch_occupancy(db, chunk_start, chunk_days)
+        for offset in range(chunk_days):
+            day = chunk_start + timedelta(days=offset)
+            lane_masks = masks.get(day, {})
+            slot_times = day_slot_times(day)
+            for i, slot_time in enumerate(slot_times):
+                if slot_time >= from_time and slot_fits(lane_masks, i, len(slot_times), units):
+                    found.append(slot_time)
+                    if len(found) == count:
+                        return found
+        chunk_start += timedelta(days=chunk_days)
+    return found
+
+async def pick_lane(db: AsyncSession, start: datetime, end: datetime, exclude: set) -> Optional[int]:
+    """Choose a lane for a new booking from the current occupancy of its day"""
+    day = start.date()
+    lane_masks = (await fetch_occupancy(db, day, 1)).get(day, {})
+    return allocate_lane(lane_masks, interval_mask(day, start, end), exclude)
+
+async def mark_slots_booked(db: AsyncSession, appointment: "Appointment"):
+    """Set the occupancy bits covered by a new booking (runs in the caller's transaction)"""
+    day = appointment.appointment_date.date()
+    await add_occupancy(db, {(day, appointment.lane): interval_mask(day, appointment.appointment_date, appointment.ends_at)})
+
+async def add_occupancy(db: AsyncSession, masks: Dict[Tuple[date, int], int]):
+    """OR bits into lane_occupancy with one upsert - at most one entry per (day, lane)"""
+    now = datetime.utcnow()
+    rows = [{"day": day, "lane": lane, "booked_mask": mask, "updated_at": now} for (day, lane), mask in masks.items() if mask]
+    if not rows:
+        return
+    stmt = pg_insert(LaneOccupancy).values(rows)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[LaneOccupancy.day, LaneOccupancy.lane],
+        set_={
+            "booked_mask": LaneOccupancy.booked_mask.op("|")(stmt.excluded.booked_mask),
+            "updated_at": stmt.excluded.updated_at
+        }
+    ))
+
+async def refresh_day_occupancy(db: AsyncSession, day: date):
+    """Recompute one day's masks from its bookings (needed on release, since bookings can share a bit)"""
+    # Lock the rows first so concurrent bookings for the same day are serialized behind us
+    await db.execute(select(LaneOccupancy.lane).where(LaneOccupancy.day == day).with_for_update())
+    day_masks = lane_masks_for(await fetch_bookings(db, day, 1)).get(day, {})
+    await db.execute(delete(LaneOccupancy).where(LaneOccupancy.day == day))
+    now = datetime.utcnow()
+    rows = [{"day": day, "lane": lane, "booked_mask": mask, "updated_at": now} for lane, mask in day_masks.items()]
+    if rows:
+        await db.execute(pg_insert(LaneOccupancy), rows)
+
+async def claim_initial_build(db: AsyncSession, model) -> bool:
+    """
+    Whether this worker should fill a derived table at startup: only while it is still empty
+    (new database or first deploy of the table), and only the worker holding its advisory lock.
+    Writes keep the table current from then on; rebuild_derived_tables.py repairs drift.
+    """
+    locked = await db.scalar(text("SELECT pg_try_advisory_xact_lock(hashtext(:name))"), {"name": model.__tablename__})
+    return bool(locked) and not await db.scalar(select(exists().select_from(model)))
+
+async def rebuild_slot_occupancy(only_if_empty: bool = False):
+    """Rebuild every occupancy row from the appointments table"""
+    async with async_session_maker() as session:
+        async with session.begin():
+            if only_if_empty and not await claim_initial_build(session, LaneOccupancy):
+                return
+            # Block concurrent bookings while the snapshot is taken so none of their bits get lost
+            await session.execute(text("LOCK TABLE lane_occupancy IN EXCLUSIVE MODE"))
+            result = await session.execute(
+                select(Appointment.appointment_date, Appointment.ends_at, Appointment.lane)
+                .where(
+                    Appointment.appointment_date.is_not(None),
+                    ACTIVE_BOOKING
+                )
+            )
+            window = timedelta(minutes=SLOT_DURATION_MINUTES)
+            masks = lane_masks_for([(start, end or start + window, lane) for start, end, lane in result.all()])
+            
+            await session.execute(delete(LaneOccupancy))
+            now = datetime.utcnow()
+            rows = [
+                {"day": day, "lane": lane, "booked_mask": mask, "updated_at": now}
+                for day, day_masks in masks.items()
+                for lane, mask in day_masks.items()
+            ]
+            if rows:
+                await session.execute(pg_insert(LaneOccupancy), rows)
+            # Not a date: every worker drops its whole availability cache
+            await notify(session, AVAILABILITY_CHANNEL, "all")
+    logger.info(f"✓ Lane occupancy rebuilt for {len(masks)} days")
+
+# ============= COUNTS =============
+async def adjust_counts(db: AsyncSession, deltas: Dict[Tuple[str, str], int]):
+    """Apply (status, inspection_status) -> delta to appointment_counts in the caller's transaction"""
+    rows = [
+        {"status": status, "inspection_status": inspection_status, "count": delta}
+        for (status, inspection_status), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+    stmt = pg_insert(AppointmentCount).values(rows)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[AppointmentCount.status, AppointmentCount.inspection_status],
+        set_={"count": AppointmentCount.count + stmt.excluded.count}
+    ))
+
+async def count_transition(db: AsyncSession, old: Tuple[str, str], new: Tuple[str, str]):
+    """Move one appointment between count buckets - the caller must hold the row lock"""
+    if old != new:
+        await adjust_counts(db, {old: -1, new: 1})
+
+def count_filters(query, model, status: Optional[str], inspection_status: Optional[str]):
+    if status:
+        query = query.where(model.status == status)
+    if inspection_status:
+        query = query.where(model.inspection_status == inspection_status)
+    return query
+
+async def total_appointments(db: AsyncSession, status: Optional[str], inspection_status: Optional[str], exact: bool = False) -> int:
+    """Total for a filter from appointment_counts (a handful of rows), or COUNT(*) when exact"""
+    if exact:
+        query = count_filters(select(func.count()).select_from(Appointment), Appointment, status, inspection_status)
+    else:
+        query = count_filters(select(func.coalesce(func.sum(AppointmentCount.count), 0)), AppointmentCount, status, inspection_status)
+    return int((await db.execute(query)).scalar())
+
+async def rebuild_appointment_counts(only_if_empty: bool = False):
+    """Recount every bucket from the appointments table"""
+    async with async_session_maker() as session:
+        async with session.begin():
+            if only_if_empty and not await claim_initial_build(session, AppointmentCount):
+                return
+            # Writers queue behind this lock, so their deltas land on top of the fresh counts
+            await session.execute(text("LOCK TABLE appointment_counts IN EXCLUSIVE MODE"))
+            result = await session.execute(
+                select(Appointment.status, Appointment.inspection_status, func.count())
+                .group_by(Appointment.status, Appointment.inspection_status)
+            )
+            rows = [{"status": s, "inspection_status": i, "count": c} for s, i, c in result.all()]
+            await session.execute(delete(AppointmentCount))
+            if rows:
+                await session.execute(pg_insert(AppointmentCount), rows)
+    logger.info(f"✓ Appointment counts rebuilt ({sum(row['count'] for row in rows)} appointments)")
+
+# ============= CONDITIONAL GET =============
+async def bump_appointments_version(db: AsyncSession):
+    """Increment the change counter in the caller's transaction - visible to readers only once it commits"""
+    stmt = pg_insert(AppointmentVersion).values(id=1, version=1)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[AppointmentVersion.id],
+        set_={"version": AppointmentVersion.version + 1}
+    ))
+
+async def appointments_version(db: AsyncSession) -> int:
+    """Current change counter: one primary key read, read BEFORE the data it validates"""
+    return int(await db.scalar(select(AppointmentVersion.version).where(AppointmentVersion.id == 1)) or 0)
+
+def make_etag(request: Request, *markers) -> str:
+    """ETag over the exact URL asked for (path + query) and whatever the body is a function of"""
+    raw = "|".join([request.url.path, request.url.query, *map(str, markers)])
+    return f'"{hashlib.sha256(raw.encode()).hexdigest()[:32]}"'
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Weak comparison, as If-None-Match requires (nginx gzip turns our ETags into W/ ones)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    # Private: bodies depend on the caller's token; no-cache: always revalidate
+    response.headers["Cache-Control"] = "private, no-cache"
+
+# ============= PAGINATION =============
+def encode_cursor(appointment: Appointment) -> str:
+    """Opaque cursor pointing just past the given row in (created_at, id) order"""
+    raw = json.dumps([appointment.created_at.isoformat(), str(appointment.id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Inverse of encode_cursor, 400 on anything that was not produced by it"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, appointment_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), uuid.UUID(appointment_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paginate(query, skip: int, limit: int, cursor: Optional[str]):
+    """
+    Apply newest-first ordering and either offset or keyset pagination.
+    With a cursor (empty string = first page) one extra row is fetched so the
+    caller can tell whether there is a next page - see split_page.
+    """
+    query = query.order_by(Appointment.created_at.desc(), Appointment.id.desc())
+    if cursor is None:
+        return query.offset(skip).limit(limit)
+    
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    if cursor:
+        created_at, appointment_id = decode_cursor(cursor)
+        query = query.where(tuple_(Appointment.created_at, Appointment.id) < tuple_(created_at, appointment_id))
+    return query.limit(limit + 1)
+
+def split_page(appointments: List[Appointment], limit: int, cursor: Optional[str]) -> Tuple[List[Appointment], Optional[str]]:
+    """Trim the look-ahead row fetched by paginate and derive next_cursor from the last row kept"""
+    if cursor is None or len(appointments) <= limit:
+        return list(appointments), None
+    page = list(appointments[:limit])
+    return page, encode_cursor(page[-1])
+
+def encode_change_cursor(appointment: Appointment) -> str:
+    """Like encode_cursor, in (updated_at, id) order - decoded by decode_cursor"""
+    raw = json.dumps([appointment.updated_at.isoformat(), str(appointment.id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+# ============= REPORTS =============
+REPORT_RENDER_WORKERS = int(os.getenv("REPORT_RENDER_WORKERS", "2"))
+REPORT_RENDER_MAX_PENDING = int(os.getenv("REPORT_RENDER_MAX_PENDING", "16"))
+
+# Report layouts declared as data. Paragraph styles: name -> (sample sheet parent, overrides)
+REPORT_PARAGRAPH_STYLES = {
+    "ReportTitle": ("Heading1", {"fontSize": 24, "textColor": colors.HexColor('#1e40af'), "spaceAfter": 30, "alignment": 1}),
+    "Notes": ("BodyText", {"fontSize": 10, "leading": 14}),
+}
+
+# Table styles: name -> TableStyle commands
+REPORT_TABLE_STYLES = {
+    "section": [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 14),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
+    ],
+}
+
+# Final status banner: one prebuilt table style per inspection outcome
+REPORT_STATUS_COLORS = {
+    "passed": colors.green,
+    "passed_with_minor_issues": colors.orange,
+    "failed": colors.red,
+}
+REPORT_STATUS_BANNER = [
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 16),
+    ('PADDING', (0, 0), (-1, -1), 12),
+]
+for outcome, outcome_color in REPORT_STATUS_COLORS.items():
+    REPORT_TABLE_STYLES[f"status.{outcome}"] = [('BACKGROUND', (0, 0), (-1, -1), outcome_color)] + REPORT_STATUS_BANNER
+
+# Page geometry and the rows of the vehicle section: (label, vehicle_info key)
+VEHICLE_REPORT_LAYOUT = {
+    "margins": inch,
+    "column_widths": [2.5*inch, 3.5*inch],
+    "section_gap": 0.3*inch,
+    "vehicle_rows": [
+        ("Registration Number", "registration"),
+        ("Brand", "brand"),
+        ("Model", "model"),
+        ("Type", "type"),
+    ],
+}
+
+class ReportStyleRegistry:
+    """Paragraph and table styles built once per process and shared by every render"""
+    
+    def __init__(self, paragraph_styles: Dict[str, Tuple[str, dict]], table_styles: Dict[str, list]):
+        sample = getSampleStyleSheet()
+        self.paragraph: Dict[str, ParagraphStyle] = {name: sample[name] for name in sample.byName}
+        for name, (parent, overrides) in paragraph_styles.items():
+            self.paragraph[name] = ParagraphStyle(name, parent=sample[parent], **overrides)
+        self.table: Dict[str, TableStyle] = {name: TableStyle(commands) for name, commands in table_styles.items()}
+    
+    def status_table(self, inspection_status: str) -> TableStyle:
+        return self.table.get(f"status.{inspection_status}", self.table["status.failed"])
+
+def build_report_styles() -> ReportStyleRegistry:
+    return ReportStyleRegistry(REPORT_PARAGRAPH_STYLES, REPORT_TABLE_STYLES)
+
+# Built at import, so once in each render worker process
+report_styles = build_report_styles()
+
+def render_vehicle_report_pdf(
+    vehicle_info: dict,
+    appointment_date: Optional[datetime],
+    inspection_status: str,
+    inspection: dict,
+    generated_at: datetime
+) -> bytes:
+    """
+    Build the inspection report PDF. CPU-bound and run in a worker process,
+    so it takes plain picklable values rather than ORM objects.
+    """
+    layout = VEHICLE_REPORT_LAYOUT
+    styles = report_styles
+    section_gap = layout["section_gap"]
+    
+    buffer = io.BytesIO()
+    margins = layout["margins"]
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=margins, leftMargin=margins, topMargin=margins, bottomMargin=margins)
+    
+    elements = [Paragraph("VEHICLE INSPECTION REPORT", styles.paragraph["ReportTitle"]), Spacer(1, section_gap)]
+    
+    # Vehicle Information
+    vehicle_data = [['Vehicle Information', '']]
+    vehicle_data += [[label, vehicle_info.get(key, 'N/A')] for label, key in layout["vehicle_rows"]]
+    vehicle_data.append(['Inspection Date', appointment_date.strftime('%Y-%m-%d %H:%M') if appointment_date else 'N/A'])
+    elements += [Table(vehicle_data, colWidths=layout["column_widths"], style=styles.table["section"]), Spacer(1, section_gap)]
+    
+    # Inspection Results
+    results_data = [['Inspection Results', '']]
+    results_data += [[key.upper(), value] for key, value in inspection.get('results', {}).items()]
+    elements += [Table(results_data, colWidths=layout["column_widths"], style=styles.table["section"]), Spacer(1, section_gap)]
+    
+    # Final Status
+    status_data = [['FINAL STATUS', inspection_status.upper().replace('_', ' ')]]
+    elements += [Table(status_data, colWidths=layout["column_widths"], style=styles.status_table(inspection_status)), Spacer(1, section_gap)]
+    
+    # Notes
+    if inspection.get('notes'):
+        elements.append(Paragraph("<b>Technician Notes:</b>", styles.paragraph['Heading3']))
+        elements.append(Paragraph(inspection['notes'], styles.paragraph["Notes"]))
+        elements.append(Spacer(1, 0.2*inch))
+    
+    # Footer
+    footer_text = f"Report generated on {generated_at.strftime('%Y-%m-%d %H:%M UTC')}<br/>Report ID: {inspection['id']}"
+    elements.append(Spacer(1, section_gap))
+    elements.append(Paragraph(footer_text, styles.paragraph['Normal']))
+    
+    doc.build(elements)
+    return buffer.getvalue()
+
+class ReportRenderPool:
+    """Bounded process pool for report rendering, keeps reportlab off the event loop"""
+    
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.rendered = 0
+        self.rejected = 0
+    
+    def start(self):
+        # spawn rather than fork: the parent already runs an event loop and DB pool threads
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+    
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    async def render(self, *args) -> bytes:
+        """Render in a worker process, 503 when max_pending renders are already queued or running"""
+        if self._executor is None or self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Report rendering is busy, please retry shortly", headers={"Retry-After": "5"})
+        
+        self.pending += 1
+        try:
+            pdf = await asyncio.get_running_loop().run_in_executor(self._executor, render_vehicle_report_pdf, *args)
+            self.rendered += 1
+            return pdf
+        finally:
+            self.pending -= 1
+    
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rendered": self.rendered,
+            "rejected": self.rejected
+        }
+
+report_renderer = ReportRenderPool(REPORT_RENDER_WORKERS, REPORT_RENDER_MAX_PENDING)
+
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "/tmp/report-cache")
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Bump whenever render_vehicle_report_pdf changes what it draws, so stale layouts are not served
+REPORT_LAYOUT_VERSION = 1
+
+def report_cache_key(appointment: Appointment, inspection: dict) -> str:
+    """Content address of a report: everything the PDF is drawn from except the generation timestamp"""
+    source = {
+        "layout": REPORT_LAYOUT_VERSION,
+        "appointment_id": str(appointment.id),
+        "vehicle_info": appointment.vehicle_info,
+        "appointment_date": appointment.appointment_date.isoformat() if appointment.appointment_date else None,
+        "inspection_status": appointment.inspection_status,
+        "inspection_id": inspection.get("id"),
+        "inspection_updated_at": inspection.get("updated_at") or inspection.get("created_at")
+    }
+    return hashlib.sha256(json.dumps(source, sort_keys=True).encode()).hexdigest()
+
+class ReportDiskCache:
+    """
+    Rendered reports on local disk, one file per content key, shared by the
+    workers of this container. File mtime doubles as the LRU clock: hits touch
+    it and eviction removes the oldest files until the directory fits max_bytes.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+    
+    def get(self, key: str) -> Optional[str]:
+        """Path of the cached report, or None on a miss"""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+    
+    def put(self, key: str, pdf: bytes) -> str:
+        """Store atomically (readers never see a partial file) and evict down to max_bytes"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp_path, path)
+        self._evict(keep=path)
+        return path
+    
+    def _evict(self, keep: str):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pdf"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # Evicted by another worker meanwhile
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+    
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+report_cache = ReportDiskCache(REPORT_CACHE_DIR, REPORT_CACHE_MAX_BYTES)
+
 # ============= EVENTS =============
 @app.on_event("startup")
 async def startup():
     logger.info("Starting Appointment Service...")
     await init_db()
+    await rebuild_slot_occupancy(only_if_empty=True)
+    await rebuild_appointment_counts(only_if_empty=True)
+    app.state.notification_listener = asyncio.create_task(notification_listener())
+    report_renderer.start()
     logger.info("✓ Appointment Service started successfully")
 
 @app.on_event("shutdown")
 async def shutdown():
     logger.info("Shutting down Appointment Service...")
+    app.state.notification_listener.cancel()
+    report_renderer.shutdown()
     await engine.dispose()
     logger.info("✓ Database connections closed")
 
@@ -204,6 +1315,19 @@ async def shutdown():
 async def health_check():
     return {"status": "healthy", "service": "appointment-service"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """In-process cache, request coalescing and report rendering counters for this worker"""
+    return {
+        "service": "appointment-service",
+        "pid": os.getpid(),
+        "availability_cache": availability_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "report_renderer": report_renderer.stats(),
+        "report_cache": report_cache.stats(),
+        "event_broker": event_broker.stats()
+    }
+
 @app.get("/test/db")
 async def test_database(db: AsyncSession = Depends(get_db)):
     """Test database connectivity and SQLAlchemy ORM"""
@@ -292,28 +1416,6 @@ async def create_appointment(
                     appointment_date=existing.appointment_date.isoformat() if existing.appointment_date else None
                 )
         
-        # Check for time slot conflicts (prevent double-booking)
-        if request.appointment_date:
-            requested_time = datetime.fromisoformat(request.appointment_date)
-            
-            # Check if this time slot is already taken
-            conflict_check = await db.execute(
-                select(Appointment)
-                .where(
-                    Appointment.appointment_date == requested_time,
-                    Appointment.status.in_(["pending", "confirmed"])
-                )
-            )
-            existing_appointment = conflict_check.scalar_one_or_none()
-            
-            if existing_appointment:
-                await log_event("AppointmentService", "appointment.conflict", "WARNING",
-                              f"Time slot {request.appointment_date} already booked")
-                raise HTTPException(
-                    status_code=409,
-                    detail=f"Time slot {request.appointment_date} is already booked. Please choose another time."
-                )
-        
         # Create appointment
         vehicle_info = {
             "type": request.vehicle_type,
@@ -322,15 +1424,47 @@ async def create_appointment(
             "model": request.vehicle_model
         }
         
-        new_appointment = Appointment(
-            user_id=uuid.UUID(user_id),
-            vehicle_info=vehicle_info,
-            idempotency_key=idempotency_key,
-            appointment_date=datetime.fromisoformat(request.appointment_date) if request.appointment_date else None
-        )
-        db.add(new_appointment)
-        await db.flush()
-        await db.refresh(new_appointment)
+        appointment_date = datetime.fromisoformat(request.appointment_date) if request.appointment_date else None
+        ends_at = appointment_date + booking_duration(request.vehicle_type) if appointment_date else None
+        
+        # Lanes are allocated from the occupancy bitmaps; the appointments_no_lane_overlap exclusion
+        # constraint rejects the INSERT if a concurrent booking took the same lane first
+        tried_lanes = set()
+        while True:
+            lane = 0
+            if appointment_date:
+                lane = await pick_lane(db, appointment_date, ends_at, tried_lanes)
+                if lane is None:
+                    await log_event("AppointmentService", "appointment.conflict", "WARNING",
+                                  f"Time slot {request.appointment_date} already booked")
+                    raise HTTPException(
+                        status_code=409,
+                        detail=f"Time slot {request.appointment_date} is already booked. Please choose another time."
+                    )
+            
+            new_appointment = Appointment(
+                user_id=uuid.UUID(user_id),
+                vehicle_info=vehicle_info,
+                idempotency_key=idempotency_key,
+                appointment_date=appointment_date,
+                ends_at=ends_at,
+                lane=lane
+            )
+            try:
+                async with db.begin_nested():
+                    db.add(new_appointment)
+                    await db.flush()
+                break
+            except IntegrityError as e:
+                if getattr(e.orig, "sqlstate", None) != EXCLUSION_VIOLATION:
+                    raise
+                tried_lanes.add(lane)
+        
+        await adjust_counts(db, {(new_appointment.status, new_appointment.inspection_status): 1})
+        if new_appointment.appointment_date:
+            await mark_slots_booked(db, new_appointment)
+            await invalidate_availability(db, new_appointment.appointment_date)
+        await publish_appointment_event(db, "slot_taken" if new_appointment.appointment_date else "status_changed", new_appointment)
         
         await log_event("AppointmentService", "appointment.created", "INFO",
                       f"User {user.get('email')} created appointment {new_appointment.id} for vehicle {request.vehicle_registration} at {request.appointment_date} on {datetime.utcnow().isoformat()}")
@@ -355,18 +1489,245 @@ async def create_appointment(
             pass
         raise HTTPException(status_code=500, detail=f"Failed to create appointment: {str(e)}")
 
+# Concurrent bookings can take a lane between our occupancy read and the INSERT; re-plan this many times
+BULK_ALLOCATION_ATTEMPTS = 3
+
+def appointment_response(a: Appointment) -> AppointmentResponse:
+    return AppointmentResponse(
+        id=str(a.id),
+        user_id=str(a.user_id),
+        vehicle_info=a.vehicle_info,
+        status=a.status,
+        payment_id=str(a.payment_id) if a.payment_id else None,
+        created_at=a.created_at.isoformat(),
+        appointment_date=a.appointment_date.isoformat() if a.appointment_date else None
+    )
+
+async def plan_bulk_lanes(db: AsyncSession, items: List[dict]) -> Dict[Tuple[date, int], int]:
+    """
+    Give each dated item a lane against current occupancy plus the items placed
+    before it, in batch order. Sets item["lane"], or item["error"] when full.
+    Returns the occupancy bits to add per (day, lane).
+    """
+    days = {item["appointment_date"].date() for item in items if item["appointment_date"]}
+    masks: Dict[date, Dict[int, int]] = {}
+    if days:
+        result = await db.execute(
+            select(LaneOccupancy.day, LaneOccupancy.lane, LaneOccupancy.booked_mask)
+            .where(LaneOccupancy.day.in_(days))
+        )
+        for row in result.all():
+            masks.setdefault(row.day, {})[row.lane] = row.booked_mask
+    
+    added: Dict[Tuple[date, int], int] = {}
+    for item in items:
+        item["lane"], item["error"] = 0, None
+        if not item["appointment_date"]:
+            continue
+        day = item["appointment_date"].date()
+        need = interval_mask(day, item["appointment_date"], item["ends_at"])
+        day_masks = masks.setdefault(day, {})
+        lane = allocate_lane(day_masks, need)
+        if lane is None:
+            item["error"] = f"Time slot {item['appointment_date'].isoformat()} is already booked"
+            continue
+        item["lane"] = lane
+        day_masks[lane] = day_masks.get(lane, 0) | need
+        added[(day, lane)] = added.get((day, lane), 0) | need
+    return added
+
+@app.post("/appointments/bulk")
+async def create_appointments_bulk(
+    request: BulkAppointmentRequest,
+    authorization: str = Header(...),
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Book many vehicles in one transaction with a single multi-row INSERT.
+    All-or-nothing by default (409 with per-item results on any conflict);
+    with partial=true the items that fit are booked and the rest reported.
+    Item i of a batch sent with Idempotency-Key K is stored under key "K:i".
+    """
+    try:
+        user = verify_token(authorization)
+        user_id = uuid.UUID(user.get("user_id"))
+        
+        results: List[dict] = [{"index": i, "status": None, "appointment": None, "error": None} for i in range(len(request.appointments))]
+        
+        # Items already booked by an earlier attempt of the same batch
+        item_keys = [f"{idempotency_key}:{i}" if idempotency_key else None for i in range(len(request.appointments))]
+        if idempotency_key:
+            result = await db.execute(select(Appointment).where(Appointment.idempotency_key.in_(item_keys)))
+            existing = {a.idempotency_key: a for a in result.scalars().all()}
+            for i, key in enumerate(item_keys):
+                if key in existing:
+                    results[i].update(status="duplicate", appointment=appointment_response(existing[key]).dict())
+        
+        pending = []
+        for i, item in enumerate(request.appointments):
+            if results[i]["status"]:
+                continue
+            try:
+                appointment_date = datetime.fromisoformat(item.appointment_date) if item.appointment_date else None
+            except ValueError:
+                results[i].update(status="invalid", error=f"Invalid date format: {item.appointment_date}")
+                continue
+            pending.append({
+                "index": i,
+                "request": item,
+                "appointment_date": appointment_date,
+                "ends_at": appointment_date + booking_duration(item.vehicle_type) if appointment_date else None
+            })
+        
+        invalid = any(r["status"] == "invalid" for r in results)
+        created: List[dict] = []
+        for attempt in range(BULK_ALLOCATION_ATTEMPTS):
+            added = await plan_bulk_lanes(db, pending)
+            conflicts = [item for item in pending if item["error"]]
+            if (conflicts or invalid) and not request.partial:
+                break
+            
+            now = datetime.utcnow()
+            created = [
+                {
+                    "id": uuid.uuid4(),
+                    "user_id": user_id,
+                    "vehicle_info": {
+                        "type": item["request"].vehicle_type,
+                        "registration": item["request"].vehicle_registration,
+                        "brand": item["request"].vehicle_brand,
+                        "model": item["request"].vehicle_model
+                    },
+                    "status": AppointmentStatus.PENDING.value,
+                    "inspection_status": "not_checked",
+                    "appointment_date": item["appointment_date"],
+                    "ends_at": item["ends_at"],
+                    "lane": item["lane"],
+                    "idempotency_key": item_keys[item["index"]],
+                    "created_at": now,
+                    "updated_at": now,
+                    "index": item["index"]
+                }
+                for item in pending if not item["error"]
+            ]
+            if not created:
+                break
+            try:
+                async with db.begin_nested():
+                    await db.execute(pg_insert(Appointment).values([{k: v for k, v in row.items() if k != "index"} for row in created]))
+                    # Same lock order as create_appointment and cancel: counts before occupancy
+                    await adjust_counts(db, {(AppointmentStatus.PENDING.value, "not_checked"): len(created)})
+                    await add_occupancy(db, added)
+                break
+            except IntegrityError as e:
+                if getattr(e.orig, "sqlstate", None) != EXCLUSION_VIOLATION:
+                    raise
+                created = []
+                if attempt == BULK_ALLOCATION_ATTEMPTS - 1:
+                    raise HTTPException(status_code=409, detail="Slots changed while booking, please retry the batch")
+        
+        for item in pending:
+            if item["error"]:
+                results[item["index"]].update(status="conflict", error=item["error"])
+        
+        if not request.partial and any(r["status"] in ("conflict", "invalid") for r in results):
+            for r in results:
+                if r["status"] is None:
+                    r["status"] = "not_booked"
+            raise HTTPException(status_code=409, detail={"message": "Batch not booked: some items could not be scheduled", "results": results})
+        
+        for row in created:
+            results[row["index"]].update(
+                status="created",
+                appointment=AppointmentResponse(
+                    id=str(row["id"]),
+                    user_id=str(row["user_id"]),
+                    vehicle_info=row["vehicle_info"],
+                    status=row["status"],
+                    payment_id=None,
+                    created_at=row["created_at"].isoformat(),
+                    appointment_date=row["appointment_date"].isoformat() if row["appointment_date"] else None
+                ).dict()
+            )
+        
+        for day in sorted({row["appointment_date"].date() for row in created if row["appointment_date"]}):
+            await invalidate_availability(db, datetime.combine(day, time()))
+        for row in created:
+            booked = Appointment(**{k: v for k, v in row.items() if k != "index"})
+            await publish_appointment_event(db, "slot_taken" if booked.appointment_date else "status_changed", booked)
+        
+        summary = {status: sum(1 for r in results if r["status"] == status) for status in ("created", "duplicate", "conflict", "invalid")}
+        await log_event("AppointmentService", "appointment.bulk_created", "INFO",
+                      f"User {user.get('email')} bulk booked {len(request.appointments)} vehicles: {summary}")
+        
+        return {**summary, "results": results}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Bulk create appointments error: {e}", exc_info=True)
+        try:
+            await log_event("AppointmentService", "appointment.bulk_create_error", "ERROR", str(e))
+        except:
+            pass
+        raise HTTPException(status_code=500, detail=f"Failed to create appointments: {str(e)}")
+
 # NOTE: Specific routes MUST come before parameterized routes to avoid routing conflicts
 # Order matters: /appointments/all, /appointments/weekly-schedule BEFORE /appointments/{user_id}
 
+async def list_all_appointments(db: AsyncSession, status: Optional[str], skip: int, limit: int, cursor: Optional[str] = None):
+    """
+    Page of all appointments, newest first, serialized for /appointments/all.
+    Offset mode returns a plain list; cursor mode returns {"items", "next_cursor"}.
+    """
+    query = select(Appointment)
+    
+    if status:
+        query = query.where(Appointment.status == status)
+    
+    query = paginate(query, skip, limit, cursor)
+    
+    try:
+        result = await db.execute(query)
+        appointments, next_cursor = split_page(result.scalars().all(), limit, cursor)
+        logger.info(f"Fetched {len(appointments)} appointments")
+    except Exception as query_error:
+        logger.error(f"Database query failed: {query_error}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Database query failed: {str(query_error)}")
+    
+    items = [
+        {
+            "id": str(a.id),
+            "user_id": str(a.user_id),
+            "vehicle_info": a.vehicle_info,
+            "status": a.status,
+            "payment_id": str(a.payment_id) if a.payment_id else None,
+            "created_at": a.created_at.isoformat(),
+            "appointment_date": a.appointment_date.isoformat() if a.appointment_date else None
+        }
+        for a in appointments
+    ]
+    if cursor is None:
+        return items
+    return {"items": items, "next_cursor": next_cursor}
+
 @app.get("/appointments/all")
 async def get_all_appointments(
+    request: Request,
+    response: Response,
     authorization: str = Header(...),
+    if_none_match: Optional[str] = Header(None),
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = None
 ):
-    """Get all appointments (admin/technician only) with optional status filter"""
+    """
+    Get all appointments (admin/technician only) with optional status filter.
+    Pass cursor (empty for the first page, then next_cursor) for keyset pagination.
+    Answers 304 when If-None-Match carries the ETag and no appointment changed since.
+    """
     try:
         user = verify_token(authorization)
         logger.info(f"User accessing /appointments/all: {user.get('email')}, role: {user.get('role')}")
@@ -376,40 +1737,19 @@ async def get_all_appointments(
             logger.warning(f"Unauthorized access attempt by {user.get('email')} with role {user.get('role')}")
             raise HTTPException(status_code=403, detail=f"Unauthorized - role '{user.get('role')}' cannot access all appointments")
         
-        query = select(Appointment).order_by(Appointment.created_at.desc())
-        
-        if status:
-            query = query.where(Appointment.status == status)
-        
-        query = query.offset(skip).limit(limit)
-        
-        logger.info("Executing database query...")
-        try:
-            result = await db.execute(query)
-            logger.info("Query executed, fetching results...")
-            appointments = result.scalars().all()
-            logger.info(f"Fetched {len(appointments)} appointments")
-        except Exception as query_error:
-            logger.error(f"Database query failed: {query_error}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"Database query failed: {str(query_error)}")
-        
-        logger.info("Serializing appointments...")
-        try:
-            return [
-                {
-                    "id": str(a.id),
-                    "user_id": str(a.user_id),
-                    "vehicle_info": a.vehicle_info,
-                    "status": a.status,
-                    "payment_id": str(a.payment_id) if a.payment_id else None,
-                    "created_at": a.created_at.isoformat(),
-                    "appointment_date": a.appointment_date.isoformat() if a.appointment_date else None
-                }
-                for a in appointments
-            ]
-        except Exception as serialize_error:
-            logger.error(f"Serialization failed: {serialize_error}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"Serialization failed: {str(serialize_error)}")
+        version = await in_own_session(appointments_version)
+        etag = make_etag(request, version)
+        if etag_matches(etag, if_none_match):
+            return not_modified(etag)
+        set_etag(response, etag)
+        
+        # The version is part of the key: a read that started before a write must not be
+        # shared with requests that already saw the write's version, or they would cache
+        # pre-write rows under the post-write ETag
+        return await single_flight.do(
+            ("appointments.all", version, status, skip, limit, cursor),
+            lambda: in_own_session(lambda session: list_all_appointments(session, status, skip, limit, cursor))
+        )
             
     except HTTPException:
         raise
@@ -421,15 +1761,124 @@ async def get_all_appointments(
             pass  # Don't let logging errors mask the real error
         raise HTTPException(status_code=500, detail=f"Failed to retrieve appointments: {str(e)}")
 
+def visible_event(event: dict, user: dict) -> dict:
+    """Staff and owners get the whole event; other customers only learn which slot changed"""
+    appointment = event.get("appointment")
+    if appointment is None or user.get("role") in ["admin", "technician", "service"] or appointment.get("user_id") == user.get("user_id"):
+        return event
+    return {
+        "type": event["type"],
+        "appointment": {key: appointment.get(key) for key in ("appointment_date", "ends_at", "lane", "status")}
+    }
+
+async def appointment_event_stream(user: dict) -> AsyncGenerator[str, None]:
+    queue = event_broker.subscribe()
+    try:
+        # EventSource reconnect delay; on reconnect clients should reload, as with a resync event
+        yield "retry: 5000\n\n"
+        event_id = 0
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            event_id += 1
+            yield f"id: {event_id}\nevent: {event['type']}\ndata: {json.dumps(visible_event(event, user))}\n\n"
+    finally:
+        event_broker.unsubscribe(queue)
+
+@app.get("/appointments/events")
+async def stream_appointment_events(
+    authorization: Optional[str] = Header(None),
+    token: Optional[str] = None
+):
+    """
+    Server-sent events: slot_taken, slot_freed and status_changed as they commit, from any worker.
+    A resync event means events were lost and lists should be refetched.
+    EventSource cannot send headers, so the JWT may also be passed as ?token=.
+    """
+    credentials = authorization or token
+    if not credentials:
+        raise HTTPException(status_code=401, detail="Missing token")
+    user = verify_token(credentials)
+    
+    return StreamingResponse(
+        appointment_event_stream(user),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Let nginx pass events through unbuffered
+        }
+    )
+
+MAX_CHANGES_PAGE = 1000
+
+def changes_query(since: Optional[str], cursor: Optional[str], limit: int):
+    """Keyset page in (updated_at, id) order, plus one look-ahead row; the cursor wins over since"""
+    query = select(Appointment).order_by(Appointment.updated_at, Appointment.id)
+    if cursor:
+        updated_at, appointment_id = decode_cursor(cursor)
+        query = query.where(tuple_(Appointment.updated_at, Appointment.id) > tuple_(updated_at, appointment_id))
+    elif since:
+        try:
+            query = query.where(Appointment.updated_at >= datetime.fromisoformat(since))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid since: {since}. Expected an ISO timestamp")
+    return query.limit(limit + 1)
+
+@app.get("/appointments/changes")
+async def get_appointment_changes(
+    authorization: str = Header(...),
+    since: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 500,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Appointments changed at or after `since` (ISO timestamp, omit for everything), oldest change first.
+    Catch-up feed for read models that otherwise follow /appointments/events: follow next_cursor
+    until it is null. Staff and service tokens only.
+    """
+    try:
+        user = verify_token(authorization)
+        
+        if user.get("role") not in ["admin", "technician", "service"]:
+            raise HTTPException(status_code=403, detail="Staff or service access required")
+        
+        limit = max(1, min(limit, MAX_CHANGES_PAGE))
+        result = await db.execute(changes_query(since, cursor, limit))
+        appointments = result.scalars().all()
+        page = appointments[:limit]
+        
+        return {
+            "items": [appointment_snapshot(a) for a in page],
+            "next_cursor": encode_change_cursor(page[-1]) if len(appointments) > limit else None
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get appointment changes error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve changes: {str(e)}")
+
 @app.get("/appointments/weekly-schedule")
 async def get_weekly_schedule(
+    request: Request,
+    response: Response,
     start_date: str,
     authorization: str = Header(...),
-    db: AsyncSession = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    vehicle_type: Optional[str] = None
 ):
-    """Get weekly schedule view with 45-minute time slots for the week"""
+    """
+    Get weekly schedule view with time slots for the week (optionally for a vehicle type's duration).
+    The schedule is a pure function of the week's occupancy masks, so they are the ETag marker.
+    """
     try:
         user = verify_token(authorization)
+        units = requested_slot_units(vehicle_type)
         
         # Parse start date
         try:
@@ -438,72 +1887,32 @@ async def get_weekly_schedule(
             logger.error(f"Invalid date format: {start_date}, error: {e}")
             raise HTTPException(status_code=400, detail=f"Invalid date format: {start_date}. Expected: YYYY-MM-DD")
         
-        # Generate 7 days
-        weekly_data = []
+        masks = await single_flight.do(
+            ("weekly-schedule.occupancy", week_start),
+            lambda: in_own_session(lambda session: cached_occupancy(session, week_start, 7))
+        )
+        etag = make_etag(
+            request,
+            sorted((day.isoformat(), sorted(lane_masks.items())) for day, lane_masks in masks.items()),
+            INSPECTION_LANES,
+            describe_working_hours()
+        )
+        if etag_matches(etag, if_none_match):
+            return not_modified(etag)
+        set_etag(response, etag)
         
-        for day_offset in range(7):
-            current_date = week_start + timedelta(days=day_offset)
-            date_str = current_date.isoformat()
-            
-            # Get slots for this day
-            time_slots = []
-            start_hour = 9
-            end_hour = 17
-            
-            current_time = datetime.combine(current_date, datetime.min.time().replace(hour=start_hour))
-            end_time = datetime.combine(current_date, datetime.min.time().replace(hour=end_hour))
-            
-            while current_time < end_time:
-                time_slots.append(current_time)
-                current_time += timedelta(minutes=45)
-            
-            # Get booked appointments for this day
-            start_of_day = datetime.combine(current_date, datetime.min.time())
-            end_of_day = datetime.combine(current_date, datetime.max.time())
-            
-            try:
-                result = await db.execute(
-                    select(Appointment.appointment_date)
-                    .where(
-                        Appointment.appointment_date >= start_of_day,
-                        Appointment.appointment_date <= end_of_day,
-                        Appointment.status.in_(["pending", "confirmed"])
-                    )
-                )
-                booked_appointments = [row[0] for row in result.all()]
-            except Exception as db_error:
-                logger.error(f"Database query error for date {current_date}: {db_error}", exc_info=True)
-                booked_appointments = []
-            
-            # Build slots for this day
-            day_slots = []
-            for slot_time in time_slots:
-                is_available = True
-                for booked in booked_appointments:
-                    if booked:
-                        time_diff = abs((slot_time - booked).total_seconds() / 60)
-                        if time_diff < 45:
-                            is_available = False
-                            break
-                
-                day_slots.append({
-                    "time": slot_time.isoformat(),
-                    "display": slot_time.strftime("%H:%M"),
-                    "available": is_available
-                })
-            
-            weekly_data.append({
-                "date": date_str,
-                "day_name": current_date.strftime("%A"),
-                "slots": day_slots,
-                "available_count": len([s for s in day_slots if s["available"]])
-            })
+        weekly_data = [
+            build_day_schedule(day, masks.get(day, {}), units)
+            for day in (week_start + timedelta(days=offset) for offset in range(7))
+        ]
         
         return {
             "week_start": start_date,
             "days": weekly_data,
-            "slot_duration_minutes": 45,
-            "working_hours": "09:00 - 17:00"
+            "slot_duration_minutes": SLOT_DURATION_MINUTES,
+            "booking_duration_minutes": SLOT_DURATION_MINUTES * units,
+            "lanes": INSPECTION_LANES,
+            "working_hours": describe_working_hours()
         }
             
     except HTTPException:
@@ -512,16 +1921,144 @@ async def get_weekly_schedule(
         logger.error(f"Get weekly schedule error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to retrieve weekly schedule: {str(e)}")
 
+@app.get("/appointments/calendar")
+async def get_month_calendar(
+    month: str,
+    authorization: str = Header(...),
+    vehicle_type: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get per-day availability summary for a whole month (month=YYYY-MM)"""
+    try:
+        verify_token(authorization)
+        units = requested_slot_units(vehicle_type)
+        
+        try:
+            month_start = datetime.strptime(month, "%Y-%m").date()
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid month format: {month}. Expected: YYYY-MM")
+        
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        days = await load_schedule(db, month_start, (next_month - month_start).days, units)
+        
+        return {
+            "month": month,
+            "slot_duration_minutes": SLOT_DURATION_MINUTES,
+            "lanes": INSPECTION_LANES,
+            "days": [
+                {
+                    "date": day["date"],
+                    "day_name": day["day_name"],
+                    "total_slots": day["total_slots"],
+                    "available_count": day["available_count"],
+                    "fully_booked": day["available_count"] == 0
+                }
+                for day in days
+            ]
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get month calendar error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve calendar: {str(e)}")
+
+@app.get("/appointments/next-available")
+async def get_next_available_slots(
+    authorization: str = Header(...),
+    from_time: Optional[str] = Query(None, alias="from"),
+    count: int = Query(5, ge=1, le=50),
+    vehicle_type: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Find the next free slots from a given time (defaults to now)"""
+    try:
+        verify_token(authorization)
+        units = requested_slot_units(vehicle_type)
+        
+        try:
+            start = datetime.fromisoformat(from_time) if from_time else datetime.utcnow()
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid datetime format: {from_time}")
+        
+        slots = await find_free_slots(db, start, count, units)
+        
+        return {
+            "from": start.isoformat(),
+            "requested": count,
+            "vehicle_type": vehicle_type,
+            "slots": [
+                {
+                    "time": slot_time.isoformat(),
+                    "date": slot_time.date().isoformat(),
+                    "display": slot_time.strftime("%H:%M")
+                }
+                for slot_time in slots
+            ],
+            "search_horizon_days": NEXT_AVAILABLE_HORIZON_DAYS,
+            "slot_duration_minutes": SLOT_DURATION_MINUTES,
+            "booking_duration_minutes": SLOT_DURATION_MINUTES * units
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get next available slots error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to search available slots: {str(e)}")
+
+async def fetch_vehicle_enrichment(appointments: List["Appointment"], authorization: str) -> Tuple[dict, dict]:
+    """
+    Payments and inspections for a list of appointments - the two services are asked concurrently,
+    each in batches of MAX_BATCH_SIZE (their limit). 502 if either lookup fails, rather than
+    answering as if nothing had been paid or inspected.
+    """
+    payment_ids = sorted({
+        str(pid) for apt in appointments for pid in (apt.payment_id, apt.inspection_payment_id) if pid
+    })
+    inspected_ids = [str(apt.id) for apt in appointments if apt.inspection_status in COMPLETED_INSPECTION_STATUSES]
+    headers = {"Authorization": f"Bearer {authorization.replace('Bearer ', '')}"}
+    
+    async with httpx.AsyncClient(timeout=10) as client:
+        async def lookup(url: str, ids: List[str], id_field: str, result_field: str) -> dict:
+            found = {}
+            for i in range(0, len(ids), MAX_BATCH_SIZE):
+                try:
+                    resp = await client.post(url, json={id_field: ids[i:i + MAX_BATCH_SIZE]}, headers=headers)
+                except httpx.HTTPError as e:
+                    logger.error(f"Batch lookup {url} failed: {e}")
+                    raise HTTPException(status_code=502, detail=f"Could not load {result_field}")
+                if resp.status_code != 200:
+                    logger.error(f"Batch lookup {url} returned {resp.status_code}: {resp.text[:200]}")
+                    raise HTTPException(status_code=502, detail=f"Could not load {result_field}")
+                found.update(resp.json().get(result_field, {}))
+            return found
+        
+        return await asyncio.gather(
+            lookup(f"{PAYMENT_SERVICE_URL}/payment/batch", payment_ids, "payment_ids", "payments"),
+            lookup(f"{INSPECTION_SERVICE_URL}/inspection/by-appointments", inspected_ids, "appointment_ids", "inspections")
+        )
+
 @app.get("/appointments/my-vehicles")
 async def get_my_vehicles(
+    request: Request,
+    response: Response,
     authorization: str = Header(...),
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get customer's vehicles with inspection status and payment info"""
+    """
+    Get customer's vehicles with inspection status and payment info.
+    304 while no appointment changed: payments and inspection results reach us as appointment writes.
+    """
     try:
         user = verify_token(authorization)
         user_id = user.get("user_id")
         
+        etag = make_etag(request, await appointments_version(db), user_id)
+        if etag_matches(etag, if_none_match):
+            return not_modified(etag)
+        set_etag(response, etag)
+        
         # Get all appointments for this user
         result = await db.execute(
             select(Appointment)
@@ -530,49 +2067,13 @@ async def get_my_vehicles(
         )
         appointments = result.scalars().all()
         
+        payments, inspections = await fetch_vehicle_enrichment(appointments, authorization)
+        
         vehicles_data = []
         for apt in appointments:
-            # Get payment info for reservation
-            payment_info = None
-            if apt.payment_id:
-                async with httpx.AsyncClient(timeout=10) as client:
-                    try:
-                        payment_resp = await client.get(
-                            f"{PAYMENT_SERVICE_URL}/payment/{str(apt.payment_id)}",
-                            headers={"Authorization": f"Bearer {authorization.replace('Bearer ', '')}"}
-                        )
-                        if payment_resp.status_code == 200:
-                            payment_info = payment_resp.json()
-                    except:
-                        pass
-            
-            # Get inspection payment info
-            inspection_payment_info = None
-            if apt.inspection_payment_id:
-                async with httpx.AsyncClient(timeout=10) as client:
-                    try:
-                        insp_pay_resp = await client.get(
-                            f"{PAYMENT_SERVICE_URL}/payment/{str(apt.inspection_payment_id)}",
-                            headers={"Authorization": f"Bearer {authorization.replace('Bearer ', '')}"}
-                        )
-                        if insp_pay_resp.status_code == 200:
-                            inspection_payment_info = insp_pay_resp.json()
-                    except:
-                        pass
-            
-            # Check if inspection report exists
-            has_report = False
-            if apt.inspection_status in ["passed", "failed", "passed_with_minor_issues"]:
-                async with httpx.AsyncClient(timeout=10) as client:
-                    try:
-                        insp_resp = await client.get(
-                            f"{INSPECTION_SERVICE_URL}/inspection/by-appointment/{str(apt.id)}",
-                            headers={"Authorization": f"Bearer {authorization.replace('Bearer ', '')}"}
-                        )
-                        if insp_resp.status_code == 200:
-                            has_report = True
-                    except:
-                        pass
+            payment_info = payments.get(str(apt.payment_id)) if apt.payment_id else None
+            inspection_payment_info = payments.get(str(apt.inspection_payment_id)) if apt.inspection_payment_id else None
+            has_report = str(apt.id) in inspections
             
             vehicles_data.append({
                 "id": str(apt.id),
@@ -586,7 +2087,7 @@ async def get_my_vehicles(
                 "payment_info": payment_info,
                 "inspection_payment_info": inspection_payment_info,
                 "has_report": has_report,
-                "can_generate_report": apt.inspection_status in ["passed", "failed", "passed_with_minor_issues"] and apt.inspection_payment_id is not None
+                "can_generate_report": apt.inspection_status in COMPLETED_INSPECTION_STATUSES and apt.inspection_payment_id is not None
             })
         
         return {
@@ -604,9 +2105,10 @@ async def get_my_vehicles(
 async def generate_vehicle_report(
     appointment_id: str,
     authorization: str = Header(...),
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
-    """Generate PDF inspection report for a vehicle"""
+    """Generate PDF inspection report for a vehicle, served from the disk cache when unchanged"""
     try:
         user = verify_token(authorization)
         user_id = user.get("user_id")
@@ -649,122 +2151,32 @@ async def generate_vehicle_report(
             
             inspection = insp_resp.json()
         
-        # Generate PDF
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=inch, leftMargin=inch, topMargin=inch, bottomMargin=inch)
-        
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1e40af'),
-            spaceAfter=30,
-            alignment=1  # Center
-        )
-        elements.append(Paragraph("VEHICLE INSPECTION REPORT", title_style))
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Vehicle Information
-        vehicle_data = [
-            ['Vehicle Information', ''],
-            ['Registration Number', appointment.vehicle_info.get('registration', 'N/A')],
-            ['Brand', appointment.vehicle_info.get('brand', 'N/A')],
-            ['Model', appointment.vehicle_info.get('model', 'N/A')],
-            ['Type', appointment.vehicle_info.get('type', 'N/A')],
-            ['Inspection Date', appointment.appointment_date.strftime('%Y-%m-%d %H:%M') if appointment.appointment_date else 'N/A'],
-        ]
-        
-        vehicle_table = Table(vehicle_data, colWidths=[2.5*inch, 3.5*inch])
-        vehicle_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 14),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
-        ]))
-        elements.append(vehicle_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Inspection Results
-        results_data = [['Inspection Results', '']]
-        results = inspection.get('results', {})
-        
-        for key, value in results.items():
-            result_color = colors.green if value == 'PASS' else colors.red
-            results_data.append([key.upper(), value])
-        
-        results_table = Table(results_data, colWidths=[2.5*inch, 3.5*inch])
-        results_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 14),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
-        ]))
-        elements.append(results_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Final Status
-        status_color = colors.green if appointment.inspection_status == 'passed' else (colors.orange if 'minor' in appointment.inspection_status else colors.red)
-        status_data = [
-            ['FINAL STATUS', appointment.inspection_status.upper().replace('_', ' ')]
-        ]
-        status_table = Table(status_data, colWidths=[2.5*inch, 3.5*inch])
-        status_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), status_color),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 16),
-            ('PADDING', (0, 0), (-1, -1), 12),
-        ]))
-        elements.append(status_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Notes
-        if inspection.get('notes'):
-            notes_style = ParagraphStyle(
-                'Notes',
-                parent=styles['BodyText'],
-                fontSize=10,
-                leading=14,
+        key = report_cache_key(appointment, inspection)
+        etag = f'"{key}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "private, no-cache",
+            "Content-Disposition": f"attachment; filename=inspection_report_{appointment.vehicle_info.get('registration', appointment_id)}.pdf"
+        }
+        if etag_matches(etag, if_none_match):
+            return not_modified(etag)
+        
+        path = report_cache.get(key)
+        if path is None:
+            pdf = await report_renderer.render(
+                appointment.vehicle_info,
+                appointment.appointment_date,
+                appointment.inspection_status,
+                inspection,
+                datetime.utcnow()
             )
-            elements.append(Paragraph("<b>Technician Notes:</b>", styles['Heading3']))
-            elements.append(Paragraph(inspection['notes'], notes_style))
-            elements.append(Spacer(1, 0.2*inch))
-        
-        # Footer
-        footer_text = f"Report generated on {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}<br/>Report ID: {inspection['id']}"
-        elements.append(Spacer(1, 0.3*inch))
-        elements.append(Paragraph(footer_text, styles['Normal']))
-        
-        # Build PDF
-        doc.build(elements)
-        buffer.seek(0)
-        
-        # Log the report generation
-        await log_event("AppointmentService", "report.generated", "INFO",
-                      f"User {user.get('email')} generated inspection report for vehicle {appointment.vehicle_info.get('registration')} - Appointment {appointment_id}")
+            path = await asyncio.to_thread(report_cache.put, key, pdf)
+            
+            # Log the report generation
+            await log_event("AppointmentService", "report.generated", "INFO",
+                          f"User {user.get('email')} generated inspection report for vehicle {appointment.vehicle_info.get('registration')} - Appointment {appointment_id}")
         
-        return StreamingResponse(
-            buffer,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename=inspection_report_{appointment.vehicle_info.get('registration', appointment_id)}.pdf"
-            }
-        )
+        return FileResponse(path, media_type="application/pdf", headers=headers)
             
     except HTTPException:
         raise
@@ -774,12 +2186,23 @@ async def generate_vehicle_report(
 
 @app.get("/appointments/admin/all-vehicles")
 async def get_all_vehicles_admin(
+    request: Request,
+    response: Response,
     authorization: str = Header(...),
+    if_none_match: Optional[str] = Header(None),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    inspection_status: Optional[str] = None,
+    exact: bool = False,
     db: AsyncSession = Depends(get_db)
 ):
-    """Admin endpoint to see ALL vehicles, not just inspected ones"""
+    """
+    Admin endpoint to see ALL vehicles, not just inspected ones (offset or cursor pagination).
+    total_count comes from appointment_counts; exact=true runs COUNT(*) instead.
+    Conditional: 304 when If-None-Match matches and no appointment changed.
+    """
     try:
         user = verify_token(authorization)
         
@@ -787,14 +2210,16 @@ async def get_all_vehicles_admin(
         if user.get("role") not in ["admin"]:
             raise HTTPException(status_code=403, detail="Admin access required")
         
+        etag = make_etag(request, await appointments_version(db))
+        if etag_matches(etag, if_none_match):
+            return not_modified(etag)
+        set_etag(response, etag)
+        
         # Get all appointments with pagination
-        result = await db.execute(
-            select(Appointment)
-            .order_by(Appointment.created_at.desc())
-            .offset(skip)
-            .limit(limit)
-        )
-        appointments = result.scalars().all()
+        query = count_filters(select(Appointment), Appointment, status, inspection_status)
+        result = await db.execute(paginate(query, skip, limit, cursor))
+        appointments, next_cursor = split_page(result.scalars().all(), limit, cursor)
+        total_count = await total_appointments(db, status, inspection_status, exact)
         
         vehicles_data = []
         for apt in appointments:
@@ -813,11 +2238,19 @@ async def get_all_vehicles_admin(
             })
         
         return {
-            "total_count": len(vehicles_data),
+            "total_count": total_count,
+            "total_exact": exact,
+            "page_count": len(vehicles_data),
             "vehicles": vehicles_data,
+            "filters": {
+                "status": status,
+                "inspection_status": inspection_status
+            },
             "pagination": {
                 "skip": skip,
-                "limit": limit
+                "limit": limit,
+                "cursor": cursor,
+                "next_cursor": next_cursor
             }
         }
             
@@ -827,28 +2260,226 @@ async def get_all_vehicles_admin(
         logger.error(f"Get all vehicles admin error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to retrieve vehicles: {str(e)}")
 
-@app.get("/appointments/{user_id}", response_model=List[AppointmentResponse])
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "1000"))
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_COLUMNS = [
+    Appointment.id, Appointment.user_id, Appointment.vehicle_info, Appointment.status,
+    Appointment.inspection_status, Appointment.appointment_date, Appointment.created_at,
+    Appointment.payment_id, Appointment.inspection_payment_id
+]
+EXPORT_CSV_HEADER = [
+    "id", "user_id", "vehicle_type", "vehicle_registration", "vehicle_brand", "vehicle_model", "status",
+    "inspection_status", "appointment_date", "created_at", "payment_id", "inspection_payment_id"
+]
+
+def export_record(row) -> dict:
+    """One exported appointment - same field names as /appointments/admin/all-vehicles"""
+    return {
+        "id": str(row.id),
+        "user_id": str(row.user_id),
+        "vehicle_info": row.vehicle_info,
+        "status": row.status,
+        "inspection_status": row.inspection_status,
+        "appointment_date": row.appointment_date.isoformat() if row.appointment_date else None,
+        "created_at": row.created_at.isoformat(),
+        "payment_id": str(row.payment_id) if row.payment_id else None,
+        "inspection_payment_id": str(row.inspection_payment_id) if row.inspection_payment_id else None
+    }
+
+def export_csv_row(record: dict) -> list:
+    vehicle = record["vehicle_info"] or {}
+    return [
+        record["id"], record["user_id"], vehicle.get("type"), vehicle.get("registration"), vehicle.get("brand"),
+        vehicle.get("model"), record["status"], record["inspection_status"], record["appointment_date"],
+        record["created_at"], record["payment_id"], record["inspection_payment_id"]
+    ]
+
+async def stream_export(query, export_format: str) -> AsyncGenerator[bytes, None]:
+    """
+    Yield the export EXPORT_BATCH_ROWS rows at a time from a server-side cursor,
+    so memory stays flat no matter how many rows match. Runs in its own session
+    because the response body is produced after the endpoint has returned.
+    """
+    async with async_session_maker() as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_ROWS))
+        
+        header_pending = export_format == "csv"
+        async for partition in result.partitions():
+            buffer = io.StringIO()
+            if export_format == "csv":
+                writer = csv.writer(buffer)
+                if header_pending:
+                    writer.writerow(EXPORT_CSV_HEADER)
+                    header_pending = False
+                writer.writerows(export_csv_row(export_record(row)) for row in partition)
+            else:
+                for row in partition:
+                    buffer.write(json.dumps(export_record(row)))
+                    buffer.write("\n")
+            yield buffer.getvalue().encode()
+        
+        if header_pending:
+            yield (",".join(EXPORT_CSV_HEADER) + "\r\n").encode()
+
+@app.get("/appointments/admin/export")
+async def export_appointments(
+    authorization: str = Header(...),
+    format: str = "ndjson",
+    status: Optional[str] = None,
+    inspection_status: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+):
+    """
+    Admin bulk export of appointments as NDJSON or CSV, streamed row batches.
+    date_from/date_to (YYYY-MM-DD, inclusive) filter on appointment_date.
+    """
+    try:
+        user = verify_token(authorization)
+        
+        if user.get("role") not in ["admin"]:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        
+        if format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of {list(EXPORT_FORMATS)}")
+        
+        try:
+            start = datetime.fromisoformat(date_from) if date_from else None
+            end = datetime.fromisoformat(date_to) + timedelta(days=1) if date_to else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Expected: YYYY-MM-DD")
+        
+        query = select(*EXPORT_COLUMNS).order_by(Appointment.created_at, Appointment.id)
+        if status:
+            query = query.where(Appointment.status == status)
+        if inspection_status:
+            query = query.where(Appointment.inspection_status == inspection_status)
+        if start:
+            query = query.where(Appointment.appointment_date >= start)
+        if end:
+            query = query.where(Appointment.appointment_date < end)
+        
+        await log_event("AppointmentService", "appointments.exported", "INFO",
+                      f"Admin {user.get('email')} exported appointments as {format} (status={status}, inspection_status={inspection_status}, from={date_from}, to={date_to})")
+        
+        return StreamingResponse(
+            stream_export(query, format),
+            media_type=EXPORT_FORMATS[format],
+            headers={
+                "Content-Disposition": f"attachment; filename=appointments_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{format}"
+            }
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Export appointments error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to export appointments: {str(e)}")
+
+# Spelled exactly like ix_appointments_registration (key inlined, not bound) so the planner can use the index
+VEHICLE_REGISTRATION = Appointment.vehicle_info.op("->>")(literal_column("'registration'"))
+
+def search_query(registration: Optional[str], brand: Optional[str], model: Optional[str], limit: int):
+    """Newest matches first; every given criterion must match"""
+    query = select(Appointment)
+    if registration:
+        # Registrations are stored upper-cased by AppointmentRequest
+        query = query.where(VEHICLE_REGISTRATION == registration.strip().upper())
+    
+    contains = {key: value for key, value in (("brand", brand), ("model", model)) if value}
+    if contains:
+        query = query.where(Appointment.vehicle_info.contains(contains))
+    
+    return query.order_by(Appointment.created_at.desc()).limit(limit)
+
+MAX_SEARCH_RESULTS = 200
+
+@app.get("/appointments/search")
+async def search_appointments(
+    authorization: str = Header(...),
+    registration: Optional[str] = None,
+    brand: Optional[str] = None,
+    model: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_SEARCH_RESULTS),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Front-desk vehicle lookup (admin/technician). Registration is matched exactly,
+    case-insensitively, through the expression index; brand and model are exact
+    matches answered by the GIN index on vehicle_info.
+    """
+    try:
+        user = verify_token(authorization)
+        
+        if user.get("role") not in ["admin", "technician"]:
+            raise HTTPException(status_code=403, detail="Unauthorized")
+        
+        if not (registration or brand or model):
+            raise HTTPException(status_code=400, detail="Provide registration, brand or model")
+        
+        result = await db.execute(search_query(registration, brand, model, limit))
+        vehicles = [export_record(apt) for apt in result.scalars().all()]
+        
+        return {"count": len(vehicles), "vehicles": vehicles}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Search appointments error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to search appointments: {str(e)}")
+
+@app.post("/appointments/batch")
+async def get_appointments_batch(
+    batch: AppointmentBatchRequest,
+    authorization: str = Header(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get many appointments in one call, keyed by ID - customers only get their own back"""
+    try:
+        user = verify_token(authorization)
+        
+        try:
+            appointment_ids = {uuid.UUID(aid) for aid in batch.appointment_ids}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid appointment ID")
+        
+        appointments = {}
+        if appointment_ids:
+            query = select(Appointment).where(Appointment.id.in_(appointment_ids))
+            if user.get("role") not in ["admin", "technician"]:
+                query = query.where(Appointment.user_id == uuid.UUID(user.get("user_id")))
+            
+            result = await db.execute(query)
+            for apt in result.scalars().all():
+                appointments[str(apt.id)] = export_record(apt)
+        
+        return {"appointments": appointments}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get appointments batch error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to retrieve appointments")
+
+@app.get("/appointments/{user_id}", response_model=Union[List[AppointmentResponse], AppointmentPage])
 async def get_appointments(
     user_id: str,
     authorization: str = Header(...),
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get appointments for user"""
+    """Get appointments for user - a list in offset mode, a page with next_cursor when cursor is passed"""
     try:
         verify_token(authorization)
         
         result = await db.execute(
-            select(Appointment)
-            .where(Appointment.user_id == uuid.UUID(user_id))
-            .order_by(Appointment.created_at.desc())
-            .offset(skip)
-            .limit(limit)
+            paginate(select(Appointment).where(Appointment.user_id == uuid.UUID(user_id)), skip, limit, cursor)
         )
-        appointments = result.scalars().all()
+        appointments, next_cursor = split_page(result.scalars().all(), limit, cursor)
         
-        return [
+        items = [
             AppointmentResponse(
                 id=str(a.id),
                 user_id=str(a.user_id),
@@ -860,6 +2491,9 @@ async def get_appointments(
             )
             for a in appointments
         ]
+        if cursor is None:
+            return items
+        return AppointmentPage(items=items, next_cursor=next_cursor)
     except HTTPException:
         raise
     except Exception as e:
@@ -878,7 +2512,7 @@ async def confirm_appointment(
         verify_token(authorization)
         
         result = await db.execute(
-            select(Appointment).where(Appointment.id == uuid.UUID(appointment_id))
+            select(Appointment).where(Appointment.id == uuid.UUID(appointment_id)).with_for_update()
         )
         appointment = result.scalar_one_or_none()
         
@@ -886,10 +2520,17 @@ async def confirm_appointment(
             raise HTTPException(status_code=404, detail="Appointment not found")
         
         # Update appointment
+        await count_transition(
+            db,
+            (appointment.status, appointment.inspection_status),
+            (AppointmentStatus.CONFIRMED.value, appointment.inspection_status)
+        )
         appointment.status = AppointmentStatus.CONFIRMED.value
         appointment.payment_id = uuid.UUID(update.payment_id)
         appointment.updated_at = datetime.utcnow()
         await db.flush()
+        await invalidate_availability(db, appointment.appointment_date)
+        await publish_appointment_event(db, "status_changed", appointment)
         
         await log_event("AppointmentService", "appointment.confirmed", "INFO",
                       f"Appointment {appointment_id} confirmed with payment {update.payment_id}")
@@ -918,7 +2559,7 @@ async def update_inspection_status(
         verify_token(authorization)
         
         result = await db.execute(
-            select(Appointment).where(Appointment.id == uuid.UUID(appointment_id))
+            select(Appointment).where(Appointment.id == uuid.UUID(appointment_id)).with_for_update()
         )
         appointment = result.scalar_one_or_none()
         
@@ -930,9 +2571,11 @@ async def update_inspection_status(
         if new_status not in ["not_checked", "in_progress", "passed", "failed", "passed_with_minor_issues"]:
             raise HTTPException(status_code=400, detail="Invalid inspection status")
         
+        await count_transition(db, (appointment.status, appointment.inspection_status), (appointment.status, new_status))
         appointment.inspection_status = new_status
         appointment.updated_at = datetime.utcnow()
         await db.flush()
+        await publish_appointment_event(db, "status_changed", appointment)
         
         await log_event("AppointmentService", "appointment.inspection_status_updated", "INFO",
                       f"Appointment {appointment_id} inspection status updated to {new_status}")
@@ -960,7 +2603,7 @@ async def cancel_appointment(
         verify_token(authorization)
         
         result = await db.execute(
-            select(Appointment).where(Appointment.id == uuid.UUID(appointment_id))
+            select(Appointment).where(Appointment.id == uuid.UUID(appointment_id)).with_for_update()
         )
         appointment = result.scalar_one_or_none()
         
@@ -970,10 +2613,20 @@ async def cancel_appointment(
         if appointment.status == AppointmentStatus.COMPLETED.value:
             raise HTTPException(status_code=400, detail="Cannot cancel completed appointment")
         
+        await count_transition(
+            db,
+            (appointment.status, appointment.inspection_status),
+            (AppointmentStatus.CANCELLED.value, appointment.inspection_status)
+        )
         appointment.status = AppointmentStatus.CANCELLED.value
         appointment.updated_at = datetime.utcnow()
         await db.flush()
         
+        if appointment.appointment_date:
+            await refresh_day_occupancy(db, appointment.appointment_date.date())
+            await invalidate_availability(db, appointment.appointment_date)
+        await publish_appointment_event(db, "slot_freed" if appointment.appointment_date else "status_changed", appointment)
+        
         await log_event("AppointmentService", "appointment.cancelled", "INFO",
                       f"Appointment {appointment_id} cancelled")
         
@@ -991,67 +2644,30 @@ async def cancel_appointment(
 async def get_available_slots(
     date: str,
     authorization: str = Header(...),
-    db: AsyncSession = Depends(get_db)
+    vehicle_type: Optional[str] = None
 ):
-    """Get available time slots for a specific date (45-minute inspections)"""
+    """Get available time slots for a specific date (optionally for a vehicle type's duration)"""
     try:
         verify_token(authorization)
+        units = requested_slot_units(vehicle_type)
         
         # Parse the date
         target_date = datetime.fromisoformat(date).date()
         
-        # Define working hours with 45-minute slots (9 AM to 5 PM)
-        # Each inspection takes 45 minutes
-        time_slots = []
-        start_hour = 9
-        end_hour = 17  # 5 PM
-        
-        current_time = datetime.combine(target_date, datetime.min.time().replace(hour=start_hour))
-        end_time = datetime.combine(target_date, datetime.min.time().replace(hour=end_hour))
-        
-        while current_time < end_time:
-            time_slots.append(current_time)
-            current_time += timedelta(minutes=45)
-        
-        # Get all booked appointments for this date
-        start_of_day = datetime.combine(target_date, datetime.min.time())
-        end_of_day = datetime.combine(target_date, datetime.max.time())
-        
-        result = await db.execute(
-            select(Appointment.appointment_date)
-            .where(
-                Appointment.appointment_date >= start_of_day,
-                Appointment.appointment_date <= end_of_day,
-                Appointment.status.in_(["pending", "confirmed"])
-            )
-        )
-        booked_appointments = [row[0] for row in result.all()]
-        
-        # Calculate available slots
-        available_slots = []
-        for slot_time in time_slots:
-            # Check if this slot or within 45 minutes is booked
-            is_available = True
-            for booked in booked_appointments:
-                if booked:
-                    # Check if booked time conflicts (within 45 minutes)
-                    time_diff = abs((slot_time - booked).total_seconds() / 60)
-                    if time_diff < 45:
-                        is_available = False
-                        break
-            
-            available_slots.append({
-                "time": slot_time.isoformat(),
-                "display": slot_time.strftime("%H:%M"),
-                "available": is_available
-            })
+        day = (await single_flight.do(
+            ("available-slots", target_date, units),
+            lambda: in_own_session(lambda session: load_schedule(session, target_date, 1, units))
+        ))[0]
         
         return {
             "date": date,
-            "slots": available_slots,
-            "total_slots": len(time_slots),
-            "available_count": len([s for s in available_slots if s["available"]]),
-            "slot_duration_minutes": 45
+            "slots": day["slots"],
+            "total_slots": day["total_slots"],
+            "available_count": day["available_count"],
+            "slot_duration_minutes": SLOT_DURATION_MINUTES,
+            "booking_duration_minutes": SLOT_DURATION_MINUTES * units,
+            "lanes": INSPECTION_LANES,
+            "working_hours": day["working_hours"]
         }
             
     except HTTPException:
@@ -0,0 +1,31 @@
+"""
+Derived Tables Rebuild
+lane_occupancy and appointment_counts are updated by every appointment write and
+only built from scratch at startup while they are empty. Run this after changing
+appointments outside the service (manual SQL, restores) or when availability or
+the dashboard counts look wrong: it recomputes both from the appointments table.
+
+Appointment writes wait for each rebuild to finish, so prefer a quiet moment.
+Uses the DB_* settings of the service (.env).
+Usage: python rebuild_derived_tables.py
+"""
+
+import asyncio
+import sys
+
+import main
+
+async def rebuild_derived_tables():
+    try:
+        await main.rebuild_slot_occupancy()
+        await main.rebuild_appointment_counts()
+    finally:
+        await main.engine.dispose()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(rebuild_derived_tables())
+    except Exception as e:
+        print(f"\n✗ Rebuild failed: {e}")
+        sys.exit(1)
+    print("✓ Derived tables rebuilt")
@@ -0,0 +1,116 @@
+"""
+/appointments/all ETags must never label pre-write rows with a post-write version.
+Run from backend/appointment-service: python -m pytest tests
+"""
+
+import asyncio
+
+from fastapi import Response
+from starlette.requests import Request
+
+import main
+
+def make_request(path: str = "/appointments/all") -> Request:
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []})
+
+def test_read_in_flight_during_a_write_is_not_shared_with_later_requests(monkeypatch):
+    """
+    A starts listing before a write and is held open. B arrives after the write, so its
+    ETag carries the new version; B must get rows that include the write instead of
+    joining A's computation.
+    """
+    db = {"version": 1, "rows": ["before"]}
+    release_first_read = asyncio.Event()
+    reads = []
+    
+    async def fake_in_own_session(work):
+        return await work(None)
+    
+    async def fake_appointments_version(session):
+        return db["version"]
+    
+    async def fake_list_all_appointments(session, status, skip, limit, cursor=None):
+        snapshot = list(db["rows"])  # what a transaction starting now would see
+        reads.append(snapshot)
+        if len(reads) == 1:
+            await release_first_read.wait()
+        return snapshot
+    
+    monkeypatch.setattr(main, "verify_token", lambda token: {"role": "admin", "email": "admin@test"})
+    monkeypatch.setattr(main, "in_own_session", fake_in_own_session)
+    monkeypatch.setattr(main, "appointments_version", fake_appointments_version)
+    monkeypatch.setattr(main, "list_all_appointments", fake_list_all_appointments)
+    monkeypatch.setattr(main, "single_flight", main.SingleFlight())
+    
+    async def get_all(if_none_match=None):
+        response = Response()
+        body = await main.get_all_appointments(
+            request=make_request(),
+            response=response,
+            authorization="Bearer test",
+            if_none_match=if_none_match,
+            status=None,
+            skip=0,
+            limit=100,
+            cursor=None
+        )
+        return body, response.headers.get("etag")
+    
+    async def scenario():
+        first = asyncio.create_task(get_all())
+        while not reads:
+            await asyncio.sleep(0)
+        
+        # A write commits while the first read is still running
+        db["rows"].append("after")
+        db["version"] += 1
+        
+        second = asyncio.create_task(get_all())
+        for _ in range(10):
+            await asyncio.sleep(0)
+        release_first_read.set()
+        return await first, await second
+    
+    (first_body, first_etag), (second_body, second_etag) = asyncio.run(scenario())
+    
+    assert first_body == ["before"]
+    assert second_body == ["before", "after"]
+    assert first_etag != second_etag
+    assert second_etag == main.make_etag(make_request(), 2)
+
+def test_identical_reads_at_the_same_version_still_share_one_query(monkeypatch):
+    release = asyncio.Event()
+    reads = []
+    
+    async def fake_in_own_session(work):
+        return await work(None)
+    
+    async def fake_appointments_version(session):
+        return 7
+    
+    async def fake_list_all_appointments(session, status, skip, limit, cursor=None):
+        reads.append(status)
+        await release.wait()
+        return ["row"]
+    
+    monkeypatch.setattr(main, "verify_token", lambda token: {"role": "technician", "email": "tech@test"})
+    monkeypatch.setattr(main, "in_own_session", fake_in_own_session)
+    monkeypatch.setattr(main, "appointments_version", fake_appointments_version)
+    monkeypatch.setattr(main, "list_all_appointments", fake_list_all_appointments)
+    monkeypatch.setattr(main, "single_flight", main.SingleFlight())
+    
+    async def scenario():
+        calls = [
+            asyncio.create_task(main.get_all_appointments(
+                request=make_request(), response=Response(), authorization="Bearer test",
+                if_none_match=None, status=None, skip=0, limit=100, cursor=None
+            ))
+            for _ in range(3)
+        ]
+        for _ in range(10):
+            await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*calls)
+    
+    assert asyncio.run(scenario()) == [["row"]] * 3
+    assert len(reads) == 1
@@ -4,25 +4,35 @@ Port: 8004
 Database: inspections_db
 """
 
-from fastapi import FastAPI, HTTPException, Header, Depends
+from fastapi import FastAPI, HTTPException, Header, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, validator
 import jwt
 import os
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any, AsyncGenerator
+from datetime import datetime, timedelta, date
+from typing import Optional, List, Dict, Tuple, Any, AsyncGenerator
 import logging
 from dotenv import load_dotenv
 import httpx
 from enum import Enum
 import uuid
+import asyncio
+import hashlib
+import json
+import zipfile
+import multiprocessing
+from io import BytesIO
+from time import monotonic
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 # SQLAlchemy imports
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base, Mapped, mapped_column
-from sqlalchemy import String, DateTime, Text, JSON, select
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import declarative_base, Mapped, mapped_column, aliased
+from sqlalchemy import String, DateTime, Date, Text, JSON, Integer, BigInteger, SmallInteger, Index, select, update, delete, exists, func, text, literal_column
+from sqlalchemy.event import listen
+from sqlalchemy.dialects.postgresql import UUID, JSONB, insert as pg_insert
 
 load_dotenv()
 
@@ -41,6 +51,9 @@ DB_NAME = os.getenv("DB_NAME_INSPECTIONS", "inspections_db")
 LOGGING_SERVICE_URL = os.getenv("LOGGING_SERVICE_URL", "http://localhost:8005")
 APPOINTMENT_SERVICE_URL = os.getenv("APPOINTMENT_SERVICE_URL", "http://localhost:8002")
 
+# Upper bound on IDs accepted by batch lookups
+MAX_BATCH_SIZE = 500
+
 # SQLAlchemy Database URL
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
@@ -51,6 +64,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Bundle-Job-Id"],
 )
 
 logging.basicConfig(level=logging.INFO)
@@ -64,6 +78,20 @@ class InspectionStatus(str, Enum):
     FAILED = "failed"
     PASSED_WITH_MINOR_ISSUES = "passed_with_minor_issues"
 
+INSPECTION_STATUS_DISPLAY = {
+    "not_checked": "Not Checked Yet",
+    "in_progress": "In Progress",
+    "passed": "Passed",
+    "failed": "Failed",
+    "passed_with_minor_issues": "Passed with Minor Issues"
+}
+
+# Bit i of Inspection.defect_mask is set when DEFECT_ITEMS[i] failed - append only, never reorder
+DEFECT_ITEMS = ["brakes", "lights", "tires", "emissions", "windscreen", "seatbelts", "horn", "wipers"]
+
+def defect_mask(results: dict) -> int:
+    return sum(1 << i for i, item in enumerate(DEFECT_ITEMS) if results.get(item) == "FAIL")
+
 class InspectionResult(BaseModel):
     brakes: str
     lights: str
@@ -94,6 +122,15 @@ class InspectionSubmit(BaseModel):
             raise ValueError(f"Status must be one of {valid}")
         return v
 
+class InspectionBatchRequest(BaseModel):
+    appointment_ids: List[str]
+    
+    @validator("appointment_ids")
+    def batch_size_valid(cls, v):
+        if len(v) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} appointment IDs per request")
+        return v
+
 class InspectionResponse(BaseModel):
     id: str
     appointment_id: str
@@ -102,12 +139,17 @@ class InspectionResponse(BaseModel):
     final_status: str
     notes: Optional[str]
     created_at: str
+    updated_at: Optional[str] = None
 
 # ============= DATABASE MODELS & CONNECTION =============
 Base = declarative_base()
 
 class Inspection(Base):
     __tablename__ = "inspections"
+    __table_args__ = (
+        # Defect analytics: GROUP BY defect_mask over a created_at range, index-only
+        Index("ix_inspections_created_at_defect_mask", "created_at", "defect_mask"),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     appointment_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False, index=True)
@@ -115,9 +157,62 @@ class Inspection(Base):
     results: Mapped[dict] = mapped_column(JSON, nullable=False)
     final_status: Mapped[str] = mapped_column(String(50), nullable=False, index=True)
     notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # results packed one bit per DEFECT_ITEMS entry, so analytics never parse the JSON
+    defect_mask: Mapped[Optional[int]] = mapped_column(SmallInteger, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class InspectionDailyStat(Base):
+    """Inspections per (day, technician, final_status), maintained on submit - stats read O(days) rows"""
+    __tablename__ = "inspection_daily_stats"
+    
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    technician_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    final_status: Mapped[str] = mapped_column(String(50), primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+class InspectionVersion(Base):
+    """Single-row change counter bumped in every transaction that writes inspections - the listings' ETag marker"""
+    __tablename__ = "inspection_version"
+    
+    id: Mapped[int] = mapped_column(SmallInteger, primary_key=True, default=1)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+class AppointmentProjection(Base):
+    """Local copy of the appointment fields this service reads, kept current from appointment-service events"""
+    __tablename__ = "appointment_projections"
+    
+    appointment_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    vehicle_info: Mapped[dict] = mapped_column(JSONB, nullable=False)  # JSONB like appointments.vehicle_info
+    appointment_date: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    status: Mapped[str] = mapped_column(String(50), nullable=False)
+    inspection_status: Mapped[str] = mapped_column(String(50), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    # appointment-service's updated_at: rows only ever move forward in it
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    synced_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class OutboxMessage(Base):
+    """Call to appointment-service recorded in the same transaction as the change it announces"""
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        # Dispatcher scan: pending messages, oldest first per path
+        Index("ix_outbox_messages_pending", "path", "created_at", postgresql_where=text("status = 'pending'")),
+    )
+    
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    method: Mapped[str] = mapped_column(String(10), nullable=False)
+    # Relative to APPOINTMENT_SERVICE_URL; messages for one path are delivered in the order they were written
+    path: Mapped[str] = mapped_column(String(500), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")  # pending, delivered or failed
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    delivered_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
 # SQLAlchemy Engine and Session
 engine = create_async_engine(
     DATABASE_URL,
@@ -140,6 +235,28 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         finally:
             await session.close()
 
+def schema_upgrades() -> List[str]:
+    """DDL that create_all cannot apply to tables that already exist"""
+    failed_bits = " | ".join(
+        f"(CASE WHEN results->>'{item}' = 'FAIL' THEN {1 << i} ELSE 0 END)" for i, item in enumerate(DEFECT_ITEMS)
+    )
+    return [
+        "ALTER TABLE inspections ADD COLUMN IF NOT EXISTS defect_mask SMALLINT",
+        # Backfill: same packing as defect_mask()
+        f"UPDATE inspections SET defect_mask = ({failed_bits}) WHERE defect_mask IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_inspections_created_at_defect_mask ON inspections (created_at, defect_mask)",
+        # appointment_projections.vehicle_info was created as JSON, which can be neither indexed nor compared
+        """
+        DO $$
+        BEGIN
+            IF (SELECT data_type FROM information_schema.columns
+                WHERE table_name = 'appointment_projections' AND column_name = 'vehicle_info') = 'json' THEN
+                ALTER TABLE appointment_projections ALTER COLUMN vehicle_info TYPE JSONB USING vehicle_info::jsonb;
+            END IF;
+        END $$;
+        """,
+    ]
+
 async def init_db():
     """Initialize database tables"""
     try:
@@ -149,6 +266,13 @@ async def init_db():
     except Exception as e:
         logger.error(f"✗ Failed to initialize database: {e}")
         raise
+    
+    for ddl in schema_upgrades():
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(ddl))
+        except Exception as e:
+            logger.error(f"✗ Failed to apply schema upgrade: {e}")
 
 # ============= HELPERS =============
 async def log_event(service: str, event: str, level: str, message: str):
@@ -188,30 +312,790 @@ def verify_technician(payload: dict):
         raise HTTPException(status_code=403, detail="Only technicians can perform inspections")
     return True
 
+# ============= CONDITIONAL GET =============
+async def bump_inspections_version(db: AsyncSession):
+    """Increment the change counter in the caller's transaction - visible to readers only once it commits"""
+    stmt = pg_insert(InspectionVersion).values(id=1, version=1)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[InspectionVersion.id],
+        set_={"version": InspectionVersion.version + 1}
+    ))
+
+async def inspections_version(db: AsyncSession) -> int:
+    return int(await db.scalar(select(InspectionVersion.version).where(InspectionVersion.id == 1)) or 0)
+
+def make_etag(request: Request, *markers) -> str:
+    """ETag over the exact URL asked for (path + query) and whatever the body is a function of"""
+    raw = "|".join([request.url.path, request.url.query, *map(str, markers)])
+    return f'"{hashlib.sha256(raw.encode()).hexdigest()[:32]}"'
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Weak comparison, as If-None-Match requires (nginx gzip turns our ETags into W/ ones)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+# ============= STATISTICS =============
+async def count_inspection(db: AsyncSession, inspection: Inspection):
+    """Add a new inspection to inspection_daily_stats in the caller's transaction"""
+    stmt = pg_insert(InspectionDailyStat).values(
+        day=inspection.created_at.date(),
+        technician_id=inspection.technician_id,
+        final_status=inspection.final_status,
+        count=1
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[InspectionDailyStat.day, InspectionDailyStat.technician_id, InspectionDailyStat.final_status],
+        set_={"count": InspectionDailyStat.count + 1}
+    ))
+
+async def claim_initial_build(db: AsyncSession, model) -> bool:
+    """
+    Whether this worker should fill a derived table at startup: only while it is still empty
+    (new database or first deploy of the table), and only the worker holding its advisory lock.
+    Submits keep the table current from then on; rebuild_inspection_stats.py repairs drift.
+    """
+    locked = await db.scalar(text("SELECT pg_try_advisory_xact_lock(hashtext(:name))"), {"name": model.__tablename__})
+    return bool(locked) and not await db.scalar(select(exists().select_from(model)))
+
+async def rebuild_inspection_daily_stats(only_if_empty: bool = False):
+    """Recount the rollup from the inspections table (backfill, and repair after any drift)"""
+    async with async_session_maker() as session:
+        async with session.begin():
+            if only_if_empty and not await claim_initial_build(session, InspectionDailyStat):
+                return
+            # Submits queue behind this lock, so their increments land on top of the fresh counts
+            await session.execute(text("LOCK TABLE inspection_daily_stats IN EXCLUSIVE MODE"))
+            day = func.date(Inspection.created_at)
+            result = await session.execute(
+                select(day, Inspection.technician_id, Inspection.final_status, func.count())
+                .group_by(day, Inspection.technician_id, Inspection.final_status)
+            )
+            rows = [
+                {"day": d, "technician_id": t, "final_status": f, "count": c}
+                for d, t, f, c in result.all()
+            ]
+            await session.execute(delete(InspectionDailyStat))
+            if rows:
+                await session.execute(pg_insert(InspectionDailyStat), rows)
+    logger.info(f"✓ Inspection daily stats rebuilt ({len(rows)} rows, {sum(row['count'] for row in rows)} inspections)")
+
+# ============= DEFECT ANALYTICS =============
+# Analytics group inspections by defect_mask: at most 2^8 groups per key, however many inspections,
+# and the per-item and co-failure figures are folded from those (mask, count) pairs in Python
+DEFECT_BUCKETS = ["day", "week", "month"]
+
+def defect_groups(keys: list, date_from: Optional[str], date_to: Optional[str], vehicle_type: Optional[str]):
+    """SELECT *keys, defect_mask, count(*) over the filtered inspections, grouped by keys and mask"""
+    vehicle_type_column = func.coalesce(AppointmentProjection.vehicle_info["type"].as_string(), "unknown")
+    keys = [vehicle_type_column if isinstance(key, str) and key == "vehicle_type" else key for key in keys]
+    query = (
+        select(*keys, Inspection.defect_mask, func.count())
+        .where(Inspection.defect_mask.is_not(None))
+        .group_by(*keys, Inspection.defect_mask)
+    )
+    if vehicle_type or any(key is vehicle_type_column for key in keys):
+        query = query.outerjoin(AppointmentProjection, AppointmentProjection.appointment_id == Inspection.appointment_id)
+    if vehicle_type:
+        query = query.where(vehicle_type_column == vehicle_type)
+    try:
+        if date_from:
+            query = query.where(Inspection.created_at >= datetime.fromisoformat(date_from))
+        if date_to:
+            query = query.where(Inspection.created_at < datetime.fromisoformat(date_to) + timedelta(days=1))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Expected: YYYY-MM-DD")
+    return query
+
+def fold_defect_masks(groups: List[Tuple[int, int]]) -> Tuple[int, List[int], List[List[int]]]:
+    """(defect_mask, inspections) pairs -> (inspections, failures per item, co-failure counts per item pair)"""
+    total = 0
+    failures = [0] * len(DEFECT_ITEMS)
+    co_failures = [[0] * len(DEFECT_ITEMS) for _ in DEFECT_ITEMS]
+    for mask, count in groups:
+        total += count
+        failed = [i for i in range(len(DEFECT_ITEMS)) if mask >> i & 1]
+        for i in failed:
+            failures[i] += count
+            for j in failed:
+                co_failures[i][j] += count
+    return total, failures, co_failures
+
+def failure_summary(total: int, failures: List[int]) -> dict:
+    return {
+        "inspections": total,
+        "failures": dict(zip(DEFECT_ITEMS, failures)),
+        "failure_rate": {item: round(failed / total, 4) if total else 0.0 for item, failed in zip(DEFECT_ITEMS, failures)}
+    }
+
+def verify_admin(user: dict):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+# ============= APPOINTMENT PROJECTION =============
+# Re-read this much before the newest projected change on catch-up: updated_at is
+# stamped before commit, so a slow transaction can land behind the high-water mark
+PROJECTION_CATCHUP_OVERLAP_SECONDS = int(os.getenv("PROJECTION_CATCHUP_OVERLAP_SECONDS", "300"))
+PROJECTION_PAGE_SIZE = 500
+PROJECTION_RETRY_SECONDS = 5
+# appointment-service sends a keepalive every 15s; silence for longer means a dead connection
+PROJECTION_READ_TIMEOUT_SECONDS = 60
+SERVICE_TOKEN_TTL_MINUTES = 60
+
+def service_token() -> str:
+    """Bearer token for this service's own calls to appointment-service (role "service", no user)"""
+    payload = {
+        "user_id": "inspection-service",
+        "email": "inspection-service",
+        "role": "service",
+        "exp": datetime.utcnow() + timedelta(minutes=SERVICE_TOKEN_TTL_MINUTES)
+    }
+    return f"Bearer {jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)}"
+
+def projection_row(snapshot: dict) -> dict:
+    """appointment-service snapshot (SSE event or /appointments/changes item) -> appointment_projections row"""
+    return {
+        "appointment_id": uuid.UUID(snapshot["id"]),
+        "user_id": uuid.UUID(snapshot["user_id"]),
+        "vehicle_info": snapshot["vehicle_info"],
+        "appointment_date": datetime.fromisoformat(snapshot["appointment_date"]) if snapshot.get("appointment_date") else None,
+        "status": snapshot["status"],
+        "inspection_status": snapshot["inspection_status"],
+        "created_at": datetime.fromisoformat(snapshot["created_at"]),
+        "updated_at": datetime.fromisoformat(snapshot["updated_at"]),
+        "synced_at": datetime.utcnow()
+    }
+
+def appointment_record(projection: AppointmentProjection) -> dict:
+    """Projected appointment in the shape of appointment-service's /appointments/batch records"""
+    return {
+        "id": str(projection.appointment_id),
+        "user_id": str(projection.user_id),
+        "vehicle_info": projection.vehicle_info,
+        "status": projection.status,
+        "inspection_status": projection.inspection_status,
+        "appointment_date": projection.appointment_date.isoformat() if projection.appointment_date else None,
+        "created_at": projection.created_at.isoformat()
+    }
+
+async def apply_appointment_snapshots(snapshots: List[dict]):
+    """Upsert snapshots into the projection; older versions never overwrite newer ones, so replays are harmless"""
+    if not snapshots:
+        return
+    rows = [projection_row(snapshot) for snapshot in snapshots]
+    async with async_session_maker() as session:
+        async with session.begin():
+            stmt = pg_insert(AppointmentProjection).values(rows)
+            await session.execute(stmt.on_conflict_do_update(
+                index_elements=[AppointmentProjection.appointment_id],
+                set_={key: stmt.excluded[key] for key in rows[0] if key != "appointment_id"},
+                where=stmt.excluded.updated_at >= AppointmentProjection.updated_at
+            ))
+    projection_sync.applied += len(rows)
+
+class ProjectionSyncState:
+    def __init__(self):
+        self.connected = False
+        self.applied = 0
+        self.last_catch_up_at: Optional[datetime] = None
+        self.last_event_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+    
+    def to_dict(self) -> dict:
+        return {
+            "connected": self.connected,
+            "applied": self.applied,
+            "last_catch_up_at": self.last_catch_up_at.isoformat() if self.last_catch_up_at else None,
+            "last_event_at": self.last_event_at.isoformat() if self.last_event_at else None,
+            "last_error": self.last_error
+        }
+
+projection_sync = ProjectionSyncState()
+
+async def fetch_appointment_page(skip: int, limit: int, authorization: str) -> List[dict]:
+    """
+    Newest-first page of /appointments/all. Only for listings asked for before this worker's first
+    catch-up: until then the projection may be empty or stale.
+    """
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.get(
+                f"{APPOINTMENT_SERVICE_URL}/appointments/all",
+                params={"skip": skip, "limit": limit},
+                headers={"Authorization": authorization}
+            )
+    except httpx.HTTPError as e:
+        logger.error(f"Appointment list unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Appointments are not available yet, retry shortly")
+    if response.status_code != 200:
+        logger.error(f"Appointment list returned {response.status_code}: {response.text[:200]}")
+        raise HTTPException(status_code=503, detail="Appointments are not available yet, retry shortly")
+    return response.json()
+
+async def catch_up_projection(client: httpx.AsyncClient):
+    """Page through /appointments/changes from just before the newest change already projected"""
+    async with async_session_maker() as session:
+        high_water = await session.scalar(select(func.max(AppointmentProjection.updated_at)))
+    params = {"limit": PROJECTION_PAGE_SIZE}
+    if high_water:
+        params["since"] = (high_water - timedelta(seconds=PROJECTION_CATCHUP_OVERLAP_SECONDS)).isoformat()
+    
+    while True:
+        response = await client.get(
+            f"{APPOINTMENT_SERVICE_URL}/appointments/changes",
+            params=params,
+            headers={"Authorization": service_token()}
+        )
+        response.raise_for_status()
+        page = response.json()
+        await apply_appointment_snapshots(page["items"])
+        if not page["next_cursor"]:
+            break
+        params = {"limit": PROJECTION_PAGE_SIZE, "cursor": page["next_cursor"]}
+    projection_sync.last_catch_up_at = datetime.utcnow()
+
+async def follow_appointment_events(lines):
+    """Apply SSE events until the stream ends or asks for a resync"""
+    data = []
+    async for line in lines:
+        if line.startswith("data:"):
+            data.append(line[5:].strip())
+            continue
+        if line or not data:
+            continue  # id:, event:, retry: and ": keepalive" lines
+        event = json.loads("\n".join(data))
+        data = []
+        if event["type"] == "resync":
+            logger.info("Appointment events asked for a resync")
+            return
+        await apply_appointment_snapshots([event["appointment"]])
+        projection_sync.last_event_at = datetime.utcnow()
+
+async def run_projection_sync():
+    """
+    Keep appointment_projections current: subscribe to /appointments/events, catch up on
+    what changed while we were not subscribed, then apply events as they arrive.
+    Subscribing first means nothing committed during the catch-up is missed.
+    """
+    while True:
+        try:
+            timeout = httpx.Timeout(10, read=PROJECTION_READ_TIMEOUT_SECONDS)
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                async with client.stream(
+                    "GET",
+                    f"{APPOINTMENT_SERVICE_URL}/appointments/events",
+                    headers={"Authorization": service_token()}
+                ) as response:
+                    response.raise_for_status()
+                    lines = response.aiter_lines()
+                    await lines.__anext__()  # "retry:" preamble - subscribed from here on
+                    await catch_up_projection(client)
+                    projection_sync.connected = True
+                    projection_sync.last_error = None
+                    await follow_appointment_events(lines)
+            projection_sync.connected = False
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            projection_sync.connected = False
+            projection_sync.last_error = str(e)
+            logger.warning(f"Appointment projection sync interrupted: {e}; retrying in {PROJECTION_RETRY_SECONDS}s")
+            await asyncio.sleep(PROJECTION_RETRY_SECONDS)
+
+async def local_appointments(db: AsyncSession, appointment_ids: List[str], authorization: str, user: dict) -> Dict[str, dict]:
+    """
+    Appointment records from the projection; only ones not projected yet are fetched from appointment-service.
+    Same visibility as /appointments/batch: customers only get their own appointments.
+    """
+    query = select(AppointmentProjection).where(
+        AppointmentProjection.appointment_id.in_([uuid.UUID(appointment_id) for appointment_id in appointment_ids])
+    )
+    if user.get("role") not in ["admin", "technician"]:
+        query = query.where(AppointmentProjection.user_id == uuid.UUID(user.get("user_id")))
+    result = await db.execute(query)
+    appointments = {str(p.appointment_id): appointment_record(p) for p in result.scalars().all()}
+    missing = [appointment_id for appointment_id in appointment_ids if appointment_id not in appointments]
+    if missing:
+        appointments.update(await fetch_appointments(missing, authorization))
+    return appointments
+
+# ============= OUTBOX =============
+# payment-service keeps a trimmed copy for appointment confirmations; fixes to delivery belong in both
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "15"))
+OUTBOX_MAX_BACKOFF_SECONDS = 600
+OUTBOX_RETENTION_DAYS = 7
+# A claimed message is left alone this long; a dispatcher that dies mid-send is retried after it
+OUTBOX_CLAIM_SECONDS = 60
+# Worth retrying; any other 4xx means the request itself is wrong and never will succeed.
+# 401 is not here: our own service token being refused is a configuration error, not a blip.
+OUTBOX_RETRYABLE_STATUSES = {408, 409, 425, 429}
+
+outbox_wakeup = asyncio.Event()
+
+def enqueue_outbox(db: AsyncSession, method: str, path: str, payload: dict):
+    """Record a call to appointment-service in the caller's transaction; it is sent once that commits"""
+    db.add(OutboxMessage(method=method, path=path, payload=payload))
+    # Wake the dispatcher as soon as the row is visible instead of at its next poll
+    listen(db.sync_session, "after_commit", lambda session: outbox_wakeup.set(), once=True)
+
+async def deliver_outbox_message(client: httpx.AsyncClient, message: OutboxMessage, token: str) -> Tuple[Optional[str], bool]:
+    """(error or None, retryable)"""
+    try:
+        response = await client.request(
+            message.method,
+            f"{APPOINTMENT_SERVICE_URL}{message.path}",
+            json=message.payload,
+            headers={"Authorization": token}
+        )
+    except httpx.HTTPError as e:
+        return f"{type(e).__name__}: {e}", True
+    if response.status_code < 300:
+        return None, False
+    error = f"HTTP {response.status_code}: {response.text[:200]}"
+    return error, response.status_code >= 500 or response.status_code in OUTBOX_RETRYABLE_STATUSES
+
+async def claim_outbox_batch() -> List[OutboxMessage]:
+    """
+    Lock a batch of due messages, count the attempt and push next_attempt_at past the claim window,
+    then commit: other dispatchers skip them until then, and no lock is held while they are sent.
+    """
+    older = aliased(OutboxMessage)
+    async with async_session_maker() as session:
+        async with session.begin():
+            result = await session.execute(
+                select(OutboxMessage)
+                .where(
+                    OutboxMessage.status == "pending",
+                    OutboxMessage.next_attempt_at <= datetime.utcnow(),
+                    # Only the oldest pending message per path: a retried update never lands after a newer one
+                    ~exists().where(
+                        older.path == OutboxMessage.path,
+                        older.status == "pending",
+                        older.created_at < OutboxMessage.created_at
+                    )
+                )
+                .order_by(OutboxMessage.created_at)
+                .limit(OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True, of=OutboxMessage)
+            )
+            messages = result.scalars().all()
+            claimed_until = datetime.utcnow() + timedelta(seconds=OUTBOX_CLAIM_SECONDS)
+            for message in messages:
+                message.attempts += 1
+                message.next_attempt_at = claimed_until
+    return messages
+
+def outbox_outcome(message: OutboxMessage, error: Optional[str], retryable: bool, now: datetime) -> dict:
+    """Column values recording one delivery attempt of a claimed message"""
+    if error is None:
+        return {"status": "delivered", "delivered_at": now, "last_error": None}
+    if retryable and message.attempts < OUTBOX_MAX_ATTEMPTS:
+        return {"next_attempt_at": now + timedelta(seconds=min(OUTBOX_MAX_BACKOFF_SECONDS, 2 ** message.attempts)), "last_error": error}
+    return {"status": "failed", "last_error": error}
+
+async def dispatch_outbox_batch(client: httpx.AsyncClient) -> int:
+    """Claim one batch of due messages, send them concurrently, then record the outcomes; returns how many were attempted"""
+    messages = await claim_outbox_batch()
+    if not messages:
+        return 0
+    
+    token = service_token()
+    outcomes = await asyncio.gather(*(deliver_outbox_message(client, message, token) for message in messages))
+    
+    now = datetime.utcnow()
+    given_up = []
+    async with async_session_maker() as session:
+        async with session.begin():
+            for message, (error, retryable) in zip(messages, outcomes):
+                values = outbox_outcome(message, error, retryable, now)
+                # The attempts match only while our claim stands; a re-claim after it lapsed owns the row now
+                await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id == message.id, OutboxMessage.attempts == message.attempts)
+                    .values(**values)
+                )
+                if values.get("status") == "failed":
+                    given_up.append(f"{message.method} {message.path} given up after {message.attempts} attempts: {error}")
+                elif error is not None:
+                    logger.warning(f"Outbox {message.method} {message.path} failed (attempt {message.attempts}): {error}")
+    
+    for failure in given_up:
+        logger.error(f"Outbox {failure}")
+        await log_event("InspectionService", "outbox.failed", "ERROR", failure)
+    return len(messages)
+
+async def purge_delivered_outbox():
+    async with async_session_maker() as session:
+        async with session.begin():
+            await session.execute(
+                delete(OutboxMessage).where(
+                    OutboxMessage.status == "delivered",
+                    OutboxMessage.delivered_at < datetime.utcnow() - timedelta(days=OUTBOX_RETENTION_DAYS)
+                )
+            )
+
+async def run_outbox_dispatcher():
+    """Send outbox messages right after the commit that wrote them, and retry due ones every OUTBOX_POLL_SECONDS"""
+    last_purge = None
+    async with httpx.AsyncClient(timeout=10) as client:
+        while True:
+            try:
+                outbox_wakeup.clear()
+                if await dispatch_outbox_batch(client) == OUTBOX_BATCH_SIZE:
+                    continue  # Probably more due right now
+                if last_purge is None or monotonic() - last_purge > 3600:
+                    await purge_delivered_outbox()
+                    last_purge = monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Outbox dispatch error: {e}")
+            try:
+                await asyncio.wait_for(outbox_wakeup.wait(), timeout=OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+# ============= CERTIFICATES =============
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
+
+if REPORTLAB_AVAILABLE:
+    CERTIFICATE_ACCENT = colors.HexColor('#1abc9c')
+    
+    # Banner colour per final status
+    CERTIFICATE_STATUS_COLORS = {
+        'passed': colors.HexColor('#4caf50'),
+        'failed': colors.HexColor('#f44336'),
+        'passed_with_minor_issues': colors.HexColor('#ff9800'),
+        'in_progress': colors.HexColor('#ffa500'),
+        'not_checked': colors.HexColor('#999999')
+    }
+    
+    # Certificate layout declared as data. Paragraph styles: name -> (sample sheet parent, overrides)
+    CERTIFICATE_PARAGRAPH_STYLES = {
+        "CertificateTitle": ("Heading1", {"fontSize": 24, "textColor": CERTIFICATE_ACCENT, "spaceAfter": 30, "alignment": TA_CENTER}),
+        "Notes": ("Normal", {"fontSize": 10, "spaceAfter": 12}),
+        "Footer": ("Normal", {"fontSize": 8, "textColor": colors.grey, "alignment": TA_CENTER}),
+    }
+    for status_name, status_color in list(CERTIFICATE_STATUS_COLORS.items()) + [("other", colors.grey)]:
+        CERTIFICATE_PARAGRAPH_STYLES[f"Status.{status_name}"] = (
+            "Normal",
+            {"fontSize": 18, "textColor": colors.white, "backColor": status_color, "alignment": TA_CENTER, "spaceAfter": 20}
+        )
+    
+    # Table styles: name -> TableStyle commands
+    CERTIFICATE_TABLE_COMMON = [
+        ('BACKGROUND', (0, 0), (-1, 0), CERTIFICATE_ACCENT),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ]
+    CERTIFICATE_TABLE_CELLS = [
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 8),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ]
+    CERTIFICATE_TABLE_STYLES = {
+        # Second header row (index 7) starts the inspection details block
+        "info": CERTIFICATE_TABLE_COMMON + [
+            ('BACKGROUND', (0, 7), (-1, 7), CERTIFICATE_ACCENT),
+            ('TEXTCOLOR', (0, 7), (-1, 7), colors.white),
+            ('FONTNAME', (0, 7), (-1, 7), 'Helvetica-Bold'),
+        ] + CERTIFICATE_TABLE_CELLS,
+        "items": CERTIFICATE_TABLE_COMMON + CERTIFICATE_TABLE_CELLS,
+    }
+    
+    CERTIFICATE_LAYOUT = {
+        "section_gap": 0.3*inch,
+        "info_column_widths": [2.5*inch, 3*inch],
+        "items_column_widths": [3*inch, 2.5*inch],
+        # (label, vehicle_info key)
+        "vehicle_rows": [
+            ("Registration Number:", "registration"),
+            ("Brand:", "brand"),
+            ("Model:", "model"),
+            ("Type:", "type"),
+            ("Year:", "year"),
+        ],
+    }
+    
+    class CertificateStyleRegistry:
+        """Paragraph and table styles built once per process and shared by every certificate"""
+        
+        def __init__(self, paragraph_styles: Dict[str, Any], table_styles: Dict[str, list]):
+            sample = getSampleStyleSheet()
+            self.paragraph = {name: sample[name] for name in sample.byName}
+            for name, (parent, overrides) in paragraph_styles.items():
+                self.paragraph[name] = ParagraphStyle(name, parent=sample[parent], **overrides)
+            self.table = {name: TableStyle(commands) for name, commands in table_styles.items()}
+        
+        def status(self, final_status: str) -> ParagraphStyle:
+            return self.paragraph.get(f"Status.{final_status}", self.paragraph["Status.other"])
+    
+    certificate_styles = CertificateStyleRegistry(CERTIFICATE_PARAGRAPH_STYLES, CERTIFICATE_TABLE_STYLES)
+
+def certificate_fields(inspection: Inspection) -> dict:
+    """Plain-value view of an inspection for render_certificate_pdf"""
+    return {
+        "id": str(inspection.id),
+        "appointment_id": str(inspection.appointment_id),
+        "final_status": inspection.final_status,
+        "results": inspection.results,
+        "notes": inspection.notes,
+        "created_at": inspection.created_at
+    }
+
+def render_certificate_pdf(inspection: dict, vehicle_info: dict, generated_at: datetime) -> bytes:
+    """
+    Build the inspection certificate PDF from plain values: inspection carries
+    id, appointment_id, final_status, results, notes and created_at (datetime).
+    """
+    layout = CERTIFICATE_LAYOUT
+    styles = certificate_styles
+    section_gap = layout["section_gap"]
+    
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    
+    elements = [Paragraph("VEHICLE INSPECTION CERTIFICATE", styles.paragraph["CertificateTitle"]), Spacer(1, section_gap)]
+    
+    # Status banner
+    status_text = inspection["final_status"].replace('_', ' ').upper()
+    elements += [Paragraph(f"<b>STATUS: {status_text}</b>", styles.status(inspection["final_status"])), Spacer(1, section_gap)]
+    
+    # Vehicle Information
+    info_data = [['Vehicle Information', '']]
+    info_data += [[label, str(vehicle_info.get(key, 'N/A'))] for label, key in layout["vehicle_rows"]]
+    info_data += [
+        ['', ''],
+        ['Inspection Details', ''],
+        ['Inspection ID:', str(inspection["id"])[:8] + '...'],
+        ['Appointment ID:', str(inspection["appointment_id"])[:8] + '...'],
+        ['Inspection Date:', inspection["created_at"].strftime('%Y-%m-%d %H:%M')],
+    ]
+    elements += [Table(info_data, colWidths=layout["info_column_widths"], style=styles.table["info"]), Spacer(1, section_gap)]
+    
+    # Inspection Items
+    items_data = [['Inspection Item', 'Result']]
+    items_data += [[key.replace('_', ' ').title(), str(value).upper()] for key, value in (inspection["results"] or {}).items()]
+    elements += [Table(items_data, colWidths=layout["items_column_widths"], style=styles.table["items"]), Spacer(1, section_gap)]
+    
+    # Notes
+    if inspection["notes"]:
+        elements.append(Paragraph("<b>Inspector Notes:</b>", styles.paragraph['Heading3']))
+        elements.append(Paragraph(inspection["notes"], styles.paragraph["Notes"]))
+        elements.append(Spacer(1, 0.2*inch))
+    
+    # Footer
+    footer_text = f"This certificate was generated on {generated_at.strftime('%Y-%m-%d %H:%M:%S')} UTC"
+    elements.append(Spacer(1, 0.5*inch))
+    elements.append(Paragraph(footer_text, styles.paragraph["Footer"]))
+    
+    doc.build(elements)
+    return buffer.getvalue()
+
+CERTIFICATE_RENDER_WORKERS = int(os.getenv("CERTIFICATE_RENDER_WORKERS", "4"))
+CERTIFICATE_BUNDLE_MAX_ITEMS = int(os.getenv("CERTIFICATE_BUNDLE_MAX_ITEMS", "2000"))
+# Finished bundle jobs kept for progress polling, oldest dropped first
+MAX_TRACKED_BUNDLE_JOBS = 100
+
+async def fetch_appointments(appointment_ids: List[str], authorization: str) -> Dict[str, dict]:
+    """Appointment records keyed by ID, looked up in batches of MAX_BATCH_SIZE"""
+    appointments = {}
+    async with httpx.AsyncClient(timeout=10) as client:
+        for i in range(0, len(appointment_ids), MAX_BATCH_SIZE):
+            response = await client.post(
+                f"{APPOINTMENT_SERVICE_URL}/appointments/batch",
+                json={"appointment_ids": appointment_ids[i:i + MAX_BATCH_SIZE]},
+                headers={"Authorization": authorization}
+            )
+            response.raise_for_status()
+            appointments.update(response.json()["appointments"])
+    return appointments
+
+class CertificateBundleJob:
+    """Progress of one certificate bundle export, polled while the ZIP streams"""
+    
+    def __init__(self, total: int, requested_by: str):
+        self.id = str(uuid.uuid4())
+        self.total = total
+        self.requested_by = requested_by
+        self.rendered = 0
+        self.failed: List[str] = []
+        self.status = "running"
+        self.started_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+    
+    def finish(self, status: str):
+        self.status = status
+        self.finished_at = datetime.utcnow()
+    
+    def to_dict(self) -> dict:
+        done = self.rendered + len(self.failed)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "rendered": self.rendered,
+            "failed": len(self.failed),
+            "progress": round(done / self.total, 3) if self.total else 1.0,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+bundle_jobs: "OrderedDict[str, CertificateBundleJob]" = OrderedDict()
+
+def track_bundle_job(job: CertificateBundleJob):
+    bundle_jobs[job.id] = job
+    while len(bundle_jobs) > MAX_TRACKED_BUNDLE_JOBS:
+        bundle_jobs.popitem(last=False)
+
+class ZipChunkStream:
+    """
+    Write-only, non-seekable file object for zipfile. zipfile then emits data
+    descriptors instead of seeking back, so each finished entry can be sent
+    to the client straight away.
+    """
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+async def stream_certificate_bundle(
+    job: CertificateBundleJob,
+    items: List[Tuple[str, dict, dict]],
+    executor: ProcessPoolExecutor
+) -> AsyncGenerator[bytes, None]:
+    """
+    Render (filename, inspection fields, vehicle_info) items in the process pool
+    and stream the ZIP as certificates complete. At most twice the pool size is
+    in flight, so finished PDFs never pile up ahead of a slow client.
+    """
+    loop = asyncio.get_running_loop()
+    generated_at = datetime.utcnow()
+    window = CERTIFICATE_RENDER_WORKERS * 2
+    
+    async def render(filename: str, fields: dict, vehicle_info: dict):
+        try:
+            return filename, await loop.run_in_executor(executor, render_certificate_pdf, fields, vehicle_info, generated_at)
+        except Exception as e:
+            logger.error(f"Certificate render failed for {filename}: {e}")
+            return filename, None
+    
+    sink = ZipChunkStream()
+    bundle = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+    queue = iter(items)
+    pending = set()
+    try:
+        while True:
+            while len(pending) < window:
+                item = next(queue, None)
+                if item is None:
+                    break
+                pending.add(asyncio.ensure_future(render(*item)))
+            if not pending:
+                break
+            
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                filename, pdf = task.result()
+                if pdf is None:
+                    job.failed.append(filename)
+                    continue
+                bundle.writestr(filename, pdf)
+                job.rendered += 1
+            yield sink.take()
+        
+        if job.failed:
+            bundle.writestr("errors.txt", "Certificates that could not be rendered:\n" + "\n".join(job.failed) + "\n")
+        bundle.close()
+        job.finish("completed")
+        yield sink.take()
+    finally:
+        # Client went away mid-stream: stop feeding the pool
+        for task in pending:
+            task.cancel()
+        if job.status == "running":
+            job.finish("cancelled")
+
 # ============= EVENTS =============
 @app.on_event("startup")
 async def startup():
     logger.info("Starting Inspection Service...")
     await init_db()
+    await rebuild_inspection_daily_stats(only_if_empty=True)
+    # spawn rather than fork: the parent already runs an event loop and DB pool threads
+    app.state.certificate_pool = ProcessPoolExecutor(
+        max_workers=CERTIFICATE_RENDER_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    app.state.projection_task = asyncio.create_task(run_projection_sync())
+    app.state.outbox_task = asyncio.create_task(run_outbox_dispatcher())
     logger.info("✓ Inspection Service started successfully")
 
 @app.on_event("shutdown")
 async def shutdown():
     logger.info("Shutting down Inspection Service...")
+    app.state.projection_task.cancel()
+    app.state.outbox_task.cancel()
+    app.state.certificate_pool.shutdown(wait=False, cancel_futures=True)
     await engine.dispose()
     logger.info("✓ Database connections closed")
 
 # ============= ENDPOINTS =============
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "inspection-service"}
+    return {"status": "healthy", "service": "inspection-service", "appointment_projection": projection_sync.to_dict()}
 
 @app.get("/inspections/vehicles-for-inspection")
 async def get_vehicles_for_inspection(
     authorization: str = Header(...),
+    skip: int = 0,
+    limit: int = 100,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get detailed list of all vehicles available for inspection with full details"""
+    """
+    Get detailed list of all vehicles available for inspection with full details.
+    Reads this service's appointment_projections; only until its first catch-up has
+    completed does it ask appointment-service instead.
+    """
     try:
         user = verify_token(authorization)
         
@@ -222,132 +1106,96 @@ async def get_vehicles_for_inspection(
         await log_event("InspectionService", "user.view_vehicles", "INFO",
                       f"User {user.get('email')} (role: {user.get('role')}) viewed vehicle list at {datetime.utcnow().isoformat()}")
         
-        # Fetch ALL appointments from Appointment Service (both paid and unpaid)
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{APPOINTMENT_SERVICE_URL}/appointments/all",
-                    headers={"Authorization": authorization},
-                    # No status filter - get ALL appointments
-                    timeout=5.0
-                )
+        # Appointments (paid and unpaid) from the local projection - newest first, as /appointments/all pages them
+        if projection_sync.last_catch_up_at is None:
+            appointments = await fetch_appointment_page(skip, limit, authorization)
+        else:
+            result = await db.execute(
+                select(AppointmentProjection)
+                .order_by(AppointmentProjection.created_at.desc())
+                .offset(skip)
+                .limit(limit)
+            )
+            appointments = [appointment_record(p) for p in result.scalars().all()]
+        
+        # Every inspection of the listed appointments in one query; later ones win
+        result = await db.execute(
+            select(Inspection)
+            .where(Inspection.appointment_id.in_([uuid.UUID(apt["id"]) for apt in appointments]))
+            .order_by(Inspection.created_at)
+        )
+        inspections = {str(inspection.appointment_id): inspection for inspection in result.scalars().all()}
+        
+        # Build comprehensive vehicle list
+        vehicles = []
+        by_status = dict.fromkeys(INSPECTION_STATUS_DISPLAY, 0)
+        for apt in appointments:
+            try:
+                inspection = inspections.get(apt["id"])
                 
-                if response.status_code == 200:
-                    appointments = response.json()
-                    logger.info(f"Fetched {len(appointments)} appointments from appointment service")
-                    
-                    # Build comprehensive vehicle list
-                    vehicles = []
-                    for apt in appointments:
-                        try:
-                            # Check if inspection exists for this appointment
-                            result = await db.execute(
-                                select(Inspection)
-                                .where(Inspection.appointment_id == uuid.UUID(apt["id"]))
-                            )
-                            inspection = result.scalar_one_or_none()
-                            
-                            # Parse appointment date safely
-                            apt_datetime = None
-                            if apt.get("appointment_date"):
-                                try:
-                                    apt_datetime = datetime.fromisoformat(apt.get("appointment_date"))
-                                except:
-                                    logger.warning(f"Could not parse date for appointment {apt['id']}")
-                            
-                            vehicle_data = {
-                                "appointment_id": apt["id"],
-                                "vehicle_info": {
-                                    "type": apt["vehicle_info"].get("type"),
-                                    "registration": apt["vehicle_info"].get("registration"),
-                                    "brand": apt["vehicle_info"].get("brand"),
-                                    "model": apt["vehicle_info"].get("model")
-                                },
-                                "appointment_date": apt.get("appointment_date"),
-                                "appointment_time": apt_datetime.strftime("%Y-%m-%d %H:%M") if apt_datetime else "Not scheduled",
-                                "user_id": apt["user_id"],
-                                "payment_status": apt.get("status", "pending"),  # Show if paid (confirmed) or unpaid (pending)
-                                "payment_status_display": "Paid" if apt.get("status") == "confirmed" else "Not Paid"
-                            }
-                            
-                            if not inspection:
-                                # No inspection yet
-                                vehicle_data.update({
-                                    "inspection_id": None,
-                                    "status": "not_checked",
-                                    "status_display": "Not Checked Yet",
-                                    "can_start": True,
-                                    "results": None,
-                                    "notes": None
-                                })
-                            else:
-                                # Inspection exists
-                                vehicle_data.update({
-                                    "inspection_id": str(inspection.id),
-                                    "status": inspection.final_status,
-                                    "status_display": {
-                                        "not_checked": "Not Checked Yet",
-                                        "in_progress": "In Progress",
-                                        "passed": "Passed",
-                                        "failed": "Failed",
-                                        "passed_with_minor_issues": "Passed with Minor Issues"
-                                    }.get(inspection.final_status, inspection.final_status),
-                                    "can_continue": inspection.final_status == "in_progress",
-                                    "results": inspection.results,
-                                    "notes": inspection.notes,
-                                    "inspected_at": inspection.created_at.isoformat()
-                                })
-                            
-                            vehicles.append(vehicle_data)
-                            logger.info(f"Added vehicle: {vehicle_data['vehicle_info']['registration']}")
-                        except Exception as vehicle_error:
-                            logger.error(f"Error processing appointment {apt.get('id')}: {vehicle_error}", exc_info=True)
-                            # Continue with next appointment instead of failing completely
-                            continue
-                    
-                    # Sort by appointment time
-                    vehicles.sort(key=lambda x: x.get("appointment_date") or "")
-                    
-                    logger.info(f"Returning {len(vehicles)} vehicles to technician")
-                    
-                    result = {
-                        "vehicles": vehicles,
-                        "total_count": len(vehicles),
-                        "by_status": {
-                            "not_checked": len([v for v in vehicles if v.get("status") == "not_checked"]),
-                            "in_progress": len([v for v in vehicles if v.get("status") == "in_progress"]),
-                            "passed": len([v for v in vehicles if v.get("status") == "passed"]),
-                            "failed": len([v for v in vehicles if v.get("status") == "failed"]),
-                            "passed_with_minor_issues": len([v for v in vehicles if v.get("status") == "passed_with_minor_issues"])
-                        }
-                    }
-                    
-                    logger.info(f"Result summary: {result['total_count']} total, {result['by_status']['not_checked']} not checked")
-                    return result
+                # Parse appointment date safely
+                apt_datetime = None
+                if apt.get("appointment_date"):
+                    try:
+                        apt_datetime = datetime.fromisoformat(apt.get("appointment_date"))
+                    except:
+                        logger.warning(f"Could not parse date for appointment {apt['id']}")
+                
+                vehicle_data = {
+                    "appointment_id": apt["id"],
+                    "vehicle_info": {
+                        "type": apt["vehicle_info"].get("type"),
+                        "registration": apt["vehicle_info"].get("registration"),
+                        "brand": apt["vehicle_info"].get("brand"),
+                        "model": apt["vehicle_info"].get("model")
+                    },
+                    "appointment_date": apt.get("appointment_date"),
+                    "appointment_time": apt_datetime.strftime("%Y-%m-%d %H:%M") if apt_datetime else "Not scheduled",
+                    "user_id": apt["user_id"],
+                    "payment_status": apt.get("status", "pending"),  # Show if paid (confirmed) or unpaid (pending)
+                    "payment_status_display": "Paid" if apt.get("status") == "confirmed" else "Not Paid"
+                }
+                
+                if not inspection:
+                    # No inspection yet
+                    vehicle_data.update({
+                        "inspection_id": None,
+                        "status": "not_checked",
+                        "status_display": "Not Checked Yet",
+                        "can_start": True,
+                        "results": None,
+                        "notes": None
+                    })
                 else:
-                    logger.warning(f"Appointment service returned status {response.status_code}")
-                    return {
-                        "vehicles": [], 
-                        "total_count": 0, 
-                        "by_status": {"not_checked": 0, "in_progress": 0, "passed": 0, "failed": 0, "passed_with_minor_issues": 0},
-                        "error": f"Appointment service error: {response.status_code}"
-                    }
-        except httpx.TimeoutException:
-            logger.error("Timeout fetching appointments from appointment service")
-            return {
-                "vehicles": [], 
-                "total_count": 0, 
-                "by_status": {"not_checked": 0, "in_progress": 0, "passed": 0, "failed": 0, "passed_with_minor_issues": 0},
-                "error": "Appointment service timeout"
-            }
-        except Exception as e:
-            logger.error(f"Error fetching appointments: {e}", exc_info=True)
-            return {
-                "vehicles": [], 
-                "total_count": 0, 
-                "by_status": {"not_checked": 0, "in_progress": 0, "passed": 0, "failed": 0, "passed_with_minor_issues": 0},
-                "error": str(e)
-            }
+                    # Inspection exists
+                    vehicle_data.update({
+                        "inspection_id": str(inspection.id),
+                        "status": inspection.final_status,
+                        "status_display": INSPECTION_STATUS_DISPLAY.get(inspection.final_status, inspection.final_status),
+                        "can_continue": inspection.final_status == "in_progress",
+                        "results": inspection.results,
+                        "notes": inspection.notes,
+                        "inspected_at": inspection.created_at.isoformat()
+                    })
+                
+                vehicles.append(vehicle_data)
+                if vehicle_data["status"] in by_status:
+                    by_status[vehicle_data["status"]] += 1
+            except Exception as vehicle_error:
+                logger.error(f"Error processing appointment {apt.get('id')}: {vehicle_error}", exc_info=True)
+                # Continue with next appointment instead of failing completely
+                continue
+        
+        # Sort by appointment time
+        vehicles.sort(key=lambda x: x.get("appointment_date") or "")
+        
+        logger.info(f"Returning {len(vehicles)} vehicles ({by_status['not_checked']} not checked)")
+        
+        return {
+            "vehicles": vehicles,
+            "total_count": len(vehicles),
+            "by_status": by_status
+        }
             
     except HTTPException:
         raise
@@ -414,45 +1262,33 @@ async def submit_inspection(
         # Get vehicle info from appointment for better logging
         vehicle_registration = "Unknown"
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                auth_header = authorization.replace("Bearer ", "")
-                apt_resp = await client.get(
-                    f"{APPOINTMENT_SERVICE_URL}/appointments/admin/all-vehicles?limit=1000",
-                    headers={"Authorization": f"Bearer {auth_header}"}
-                )
-                if apt_resp.status_code == 200:
-                    apt_data = apt_resp.json()
-                    for vehicle in apt_data.get("vehicles", []):
-                        if vehicle["id"] == data.appointment_id:
-                            vehicle_registration = vehicle.get("vehicle_info", {}).get("registration", "Unknown")
-                            break
-        except:
-            pass
+            appointment = (await local_appointments(db, [data.appointment_id], authorization, user)).get(data.appointment_id)
+            if appointment:
+                vehicle_registration = appointment.get("vehicle_info", {}).get("registration", "Unknown")
+        except Exception as e:
+            logger.warning(f"Could not look up vehicle for appointment {data.appointment_id}: {e}")
         
         new_inspection = Inspection(
             appointment_id=uuid.UUID(data.appointment_id),
             technician_id=uuid.UUID(technician_id),
             results=results,
             final_status=data.final_status,
-            notes=data.notes
+            notes=data.notes,
+            defect_mask=defect_mask(results)
         )
         db.add(new_inspection)
         await db.flush()
         await db.refresh(new_inspection)
+        await count_inspection(db, new_inspection)
+        await bump_inspections_version(db)
         
-        # Update appointment inspection_status
-        try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                auth_header = authorization.replace("Bearer ", "")
-                update_resp = await client.put(
-                    f"{APPOINTMENT_SERVICE_URL}/appointments/{data.appointment_id}/inspection-status",
-                    json={"inspection_status": data.final_status},
-                    headers={"Authorization": f"Bearer {auth_header}"}
-                )
-                if update_resp.status_code != 200:
-                    logger.warning(f"Failed to update appointment inspection status: {update_resp.status_code}")
-        except Exception as e:
-            logger.error(f"Error updating appointment inspection status: {e}")
+        # Update appointment inspection_status - sent by the outbox dispatcher once this commits
+        enqueue_outbox(
+            db,
+            "PUT",
+            f"/appointments/{data.appointment_id}/inspection-status",
+            {"inspection_status": data.final_status}
+        )
         
         await log_event("InspectionService", "inspection.submitted", "INFO",
                       f"Technician {user.get('email')} submitted inspection for vehicle {vehicle_registration} (Appointment {data.appointment_id}) with status {data.final_status} at {datetime.utcnow().isoformat()}")
@@ -464,7 +1300,8 @@ async def submit_inspection(
             results=new_inspection.results,
             final_status=new_inspection.final_status,
             notes=new_inspection.notes,
-            created_at=new_inspection.created_at.isoformat()
+            created_at=new_inspection.created_at.isoformat(),
+            updated_at=new_inspection.updated_at.isoformat() if new_inspection.updated_at else None
         )
             
     except HTTPException:
@@ -499,7 +1336,8 @@ async def get_inspection_by_appointment(
             results=inspection.results,
             final_status=inspection.final_status,
             notes=inspection.notes,
-            created_at=inspection.created_at.isoformat()
+            created_at=inspection.created_at.isoformat(),
+            updated_at=inspection.updated_at.isoformat() if inspection.updated_at else None
         )
             
     except HTTPException:
@@ -508,6 +1346,49 @@ async def get_inspection_by_appointment(
         logger.error(f"Get inspection by appointment error: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve inspection")
 
+@app.post("/inspection/by-appointments")
+async def get_inspections_by_appointments(
+    batch: InspectionBatchRequest,
+    authorization: str = Header(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get inspections for many appointments in one call, keyed by appointment ID"""
+    try:
+        verify_token(authorization)
+        
+        try:
+            appointment_ids = {uuid.UUID(aid) for aid in batch.appointment_ids}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid appointment ID")
+        
+        inspections = {}
+        if appointment_ids:
+            result = await db.execute(
+                select(Inspection)
+                .where(Inspection.appointment_id.in_(appointment_ids))
+                .order_by(Inspection.created_at)
+            )
+            # Ordered oldest first so the latest inspection wins for an appointment
+            for inspection in result.scalars().all():
+                inspections[str(inspection.appointment_id)] = InspectionResponse(
+                    id=str(inspection.id),
+                    appointment_id=str(inspection.appointment_id),
+                    technician_id=str(inspection.technician_id),
+                    results=inspection.results,
+                    final_status=inspection.final_status,
+                    notes=inspection.notes,
+                    created_at=inspection.created_at.isoformat(),
+                    updated_at=inspection.updated_at.isoformat() if inspection.updated_at else None
+                ).dict()
+        
+        return {"inspections": inspections}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get inspections batch error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve inspections")
+
 @app.get("/inspections/result/{appointment_id}", response_model=InspectionResponse)
 async def get_inspection_result(
     appointment_id: str,
@@ -533,7 +1414,8 @@ async def get_inspection_result(
             results=inspection.results,
             final_status=inspection.final_status,
             notes=inspection.notes,
-            created_at=inspection.created_at.isoformat()
+            created_at=inspection.created_at.isoformat(),
+            updated_at=inspection.updated_at.isoformat() if inspection.updated_at else None
         )
             
     except HTTPException:
@@ -615,13 +1497,16 @@ async def get_inspection_by_appointment_id(
 # ============= ADMIN ENDPOINTS =============
 @app.get("/admin/inspections/all")
 async def get_all_inspections_admin(
+    request: Request,
+    response: Response,
     authorization: str = Header(...),
+    if_none_match: Optional[str] = Header(None),
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all inspections with full details (admin only, read-only)"""
+    """Get all inspections with full details (admin only, read-only); 304 while none was submitted since"""
     try:
         user = verify_token(authorization)
         
@@ -631,6 +1516,11 @@ async def get_all_inspections_admin(
         await log_event("InspectionService", "admin.view_inspections", "INFO",
                       f"Admin {user.get('email')} viewed inspection list at {datetime.utcnow().isoformat()}")
         
+        etag = make_etag(request, await inspections_version(db))
+        if etag_matches(etag, if_none_match):
+            return not_modified(etag)
+        set_etag(response, etag)
+        
         query = select(Inspection).order_by(Inspection.created_at.desc())
         
         if status:
@@ -674,27 +1564,48 @@ async def get_all_inspections_admin(
 @app.get("/admin/inspections/stats")
 async def get_inspection_stats_admin(
     authorization: str = Header(...),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    technician_id: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get inspection statistics (admin only)"""
+    """
+    Get inspection statistics (admin only), optionally for a date range (YYYY-MM-DD,
+    inclusive) and one technician. Summed from inspection_daily_stats, not the inspections.
+    """
     try:
         user = verify_token(authorization)
         
         if user.get("role") != "admin":
             raise HTTPException(status_code=403, detail="Admin access required")
         
+        query = select(InspectionDailyStat.final_status, func.sum(InspectionDailyStat.count)).group_by(InspectionDailyStat.final_status)
+        try:
+            if date_from:
+                query = query.where(InspectionDailyStat.day >= date.fromisoformat(date_from))
+            if date_to:
+                query = query.where(InspectionDailyStat.day <= date.fromisoformat(date_to))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Expected: YYYY-MM-DD")
+        if technician_id:
+            try:
+                query = query.where(InspectionDailyStat.technician_id == uuid.UUID(technician_id))
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid technician_id")
+        
         # Count by status
-        result = await db.execute(select(Inspection))
-        all_inspections = result.scalars().all()
+        result = await db.execute(query)
+        by_status = dict.fromkeys(INSPECTION_STATUS_DISPLAY, 0)
+        for final_status, count in result.all():
+            by_status[final_status] = int(count)
         
         stats = {
-            "total_inspections": len(all_inspections),
-            "by_status": {
-                "not_checked": len([i for i in all_inspections if i.final_status == "not_checked"]),
-                "in_progress": len([i for i in all_inspections if i.final_status == "in_progress"]),
-                "passed": len([i for i in all_inspections if i.final_status == "passed"]),
-                "failed": len([i for i in all_inspections if i.final_status == "failed"]),
-                "passed_with_minor_issues": len([i for i in all_inspections if i.final_status == "passed_with_minor_issues"])
+            "total_inspections": sum(by_status.values()),
+            "by_status": by_status,
+            "filters": {
+                "date_from": date_from,
+                "date_to": date_to,
+                "technician_id": technician_id
             }
         }
         
@@ -709,6 +1620,116 @@ async def get_inspection_stats_admin(
         logger.error(f"Admin get stats error: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve statistics")
 
+@app.get("/admin/inspections/defects/rates")
+async def get_defect_rates(
+    authorization: str = Header(...),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    vehicle_type: Optional[str] = None,
+    by_vehicle_type: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Failure rate of every checked item (admin only), optionally for a date range (YYYY-MM-DD,
+    inclusive) and vehicle type, or broken down by vehicle type.
+    """
+    try:
+        verify_admin(verify_token(authorization))
+        
+        if by_vehicle_type:
+            result = await db.execute(defect_groups(["vehicle_type"], date_from, date_to, vehicle_type))
+            groups = {}
+            for group_type, mask, count in result.all():
+                groups.setdefault(group_type, []).append((mask, count))
+            return {
+                "items": DEFECT_ITEMS,
+                "by_vehicle_type": {
+                    group_type: failure_summary(*fold_defect_masks(masks)[:2])
+                    for group_type, masks in sorted(groups.items())
+                }
+            }
+        
+        result = await db.execute(defect_groups([], date_from, date_to, vehicle_type))
+        return {"items": DEFECT_ITEMS, **failure_summary(*fold_defect_masks(result.all())[:2])}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Defect rates error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to compute defect rates")
+
+@app.get("/admin/inspections/defects/co-failures")
+async def get_defect_co_failures(
+    authorization: str = Header(...),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    vehicle_type: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Co-failure matrix (admin only): counts[i][j] inspections failed both items i and j
+    (the diagonal is each item's failures); conditional[i][j] = P(j failed | i failed).
+    """
+    try:
+        verify_admin(verify_token(authorization))
+        
+        result = await db.execute(defect_groups([], date_from, date_to, vehicle_type))
+        total, failures, co_failures = fold_defect_masks(result.all())
+        
+        return {
+            "items": DEFECT_ITEMS,
+            "inspections": total,
+            "counts": co_failures,
+            "conditional": [
+                [round(both / failures[i], 4) if failures[i] else 0.0 for both in row]
+                for i, row in enumerate(co_failures)
+            ]
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Defect co-failures error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to compute co-failures")
+
+@app.get("/admin/inspections/defects/timeseries")
+async def get_defect_timeseries(
+    authorization: str = Header(...),
+    bucket: str = "week",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    vehicle_type: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Failure rate of every item per day, week or month (admin only), oldest period first"""
+    try:
+        verify_admin(verify_token(authorization))
+        
+        if bucket not in DEFECT_BUCKETS:
+            raise HTTPException(status_code=400, detail=f"bucket must be one of {DEFECT_BUCKETS}")
+        
+        # Inlined (bucket is whitelisted) so the SELECT and GROUP BY expressions are textually identical
+        period = func.date_trunc(literal_column(f"'{bucket}'"), Inspection.created_at)
+        result = await db.execute(defect_groups([period], date_from, date_to, vehicle_type))
+        periods = {}
+        for start, mask, count in result.all():
+            periods.setdefault(start, []).append((mask, count))
+        
+        return {
+            "items": DEFECT_ITEMS,
+            "bucket": bucket,
+            "series": [
+                {"period": start.date().isoformat(), **failure_summary(*fold_defect_masks(masks)[:2])}
+                for start, masks in sorted(periods.items())
+            ]
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Defect time series error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to compute defect time series")
+
 @app.get("/inspections/certificate/{appointment_id}")
 async def generate_inspection_certificate(
     appointment_id: str,
@@ -729,163 +1750,26 @@ async def generate_inspection_certificate(
             raise HTTPException(status_code=404, detail="Inspection not found")
         
         # Fetch appointment details to get vehicle info
-        async with httpx.AsyncClient() as client:
-            apt_response = await client.get(
-                f"http://localhost:8002/appointments/details/{appointment_id}",
-                headers={"Authorization": authorization}
-            )
-            
-            if apt_response.status_code != 200:
-                raise HTTPException(status_code=404, detail="Appointment not found")
-            
-            appointment = apt_response.json()
+        appointment = (await local_appointments(db, [appointment_id], authorization, user)).get(appointment_id)
+        if not appointment:
+            raise HTTPException(status_code=404, detail="Appointment not found")
         
-        # Generate PDF content (simple text-based PDF using reportlab)
-        try:
-            from reportlab.lib.pagesizes import letter, A4
-            from reportlab.lib import colors
-            from reportlab.lib.units import inch
-            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-            from reportlab.lib.enums import TA_CENTER, TA_LEFT
-            from io import BytesIO
-            
-            # Create PDF in memory
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=A4)
-            elements = []
-            styles = getSampleStyleSheet()
-            
-            # Title
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=24,
-                textColor=colors.HexColor('#1abc9c'),
-                spaceAfter=30,
-                alignment=TA_CENTER
-            )
-            elements.append(Paragraph("VEHICLE INSPECTION CERTIFICATE", title_style))
-            elements.append(Spacer(1, 0.3*inch))
-            
-            # Status banner
-            status_text = inspection.final_status.replace('_', ' ').upper()
-            status_color = {
-                'passed': colors.HexColor('#4caf50'),
-                'failed': colors.HexColor('#f44336'),
-                'passed_with_minor_issues': colors.HexColor('#ff9800'),
-                'in_progress': colors.HexColor('#ffa500'),
-                'not_checked': colors.HexColor('#999999')
-            }.get(inspection.final_status, colors.grey)
-            
-            status_style = ParagraphStyle(
-                'Status',
-                parent=styles['Normal'],
-                fontSize=18,
-                textColor=colors.white,
-                backColor=status_color,
-                alignment=TA_CENTER,
-                spaceAfter=20
-            )
-            elements.append(Paragraph(f"<b>STATUS: {status_text}</b>", status_style))
-            elements.append(Spacer(1, 0.3*inch))
-            
-            # Vehicle Information
-            vehicle_info = appointment.get('vehicle_info', {})
-            info_data = [
-                ['Vehicle Information', ''],
-                ['Registration Number:', vehicle_info.get('registration', 'N/A')],
-                ['Brand:', vehicle_info.get('brand', 'N/A')],
-                ['Model:', vehicle_info.get('model', 'N/A')],
-                ['Type:', vehicle_info.get('type', 'N/A')],
-                ['Year:', str(vehicle_info.get('year', 'N/A'))],
-                ['', ''],
-                ['Inspection Details', ''],
-                ['Inspection ID:', str(inspection.id)[:8] + '...'],
-                ['Appointment ID:', str(inspection.appointment_id)[:8] + '...'],
-                ['Inspection Date:', inspection.created_at.strftime('%Y-%m-%d %H:%M')],
-            ]
-            
-            info_table = Table(info_data, colWidths=[2.5*inch, 3*inch])
-            info_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1abc9c')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 7), (-1, 7), colors.HexColor('#1abc9c')),
-                ('TEXTCOLOR', (0, 7), (-1, 7), colors.white),
-                ('FONTNAME', (0, 7), (-1, 7), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 8),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ]))
-            elements.append(info_table)
-            elements.append(Spacer(1, 0.3*inch))
-            
-            # Inspection Items
-            results = inspection.results or {}
-            items_data = [['Inspection Item', 'Result']]
-            for key, value in results.items():
-                items_data.append([key.replace('_', ' ').title(), str(value).upper()])
-            
-            items_table = Table(items_data, colWidths=[3*inch, 2.5*inch])
-            items_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1abc9c')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 8),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ]))
-            elements.append(items_table)
-            elements.append(Spacer(1, 0.3*inch))
-            
-            # Notes
-            if inspection.notes:
-                notes_style = ParagraphStyle(
-                    'Notes',
-                    parent=styles['Normal'],
-                    fontSize=10,
-                    spaceAfter=12
-                )
-                elements.append(Paragraph("<b>Inspector Notes:</b>", styles['Heading3']))
-                elements.append(Paragraph(inspection.notes, notes_style))
-                elements.append(Spacer(1, 0.2*inch))
-            
-            # Footer
-            footer_text = f"This certificate was generated on {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC"
-            footer_style = ParagraphStyle(
-                'Footer',
-                parent=styles['Normal'],
-                fontSize=8,
-                textColor=colors.grey,
-                alignment=TA_CENTER
+        vehicle_info = appointment.get('vehicle_info', {})
+        
+        if REPORTLAB_AVAILABLE:
+            pdf = await asyncio.get_running_loop().run_in_executor(
+                app.state.certificate_pool, render_certificate_pdf, certificate_fields(inspection), vehicle_info, datetime.utcnow()
             )
-            elements.append(Spacer(1, 0.5*inch))
-            elements.append(Paragraph(footer_text, footer_style))
-            
-            # Build PDF
-            doc.build(elements)
-            buffer.seek(0)
-            
             return StreamingResponse(
-                buffer,
+                BytesIO(pdf),
                 media_type="application/pdf",
                 headers={"Content-Disposition": f"attachment; filename=inspection_certificate_{appointment_id}.pdf"}
             )
-            
-        except ImportError:
-            # Fallback: Generate simple text-based response if reportlab not available
-            logger.warning("reportlab not installed, generating simple text certificate")
-            
-            text_content = f"""
+        
+        # Fallback: Generate simple text-based response if reportlab not available
+        logger.warning("reportlab not installed, generating simple text certificate")
+        
+        text_content = f"""
 VEHICLE INSPECTION CERTIFICATE
 ==============================
 
@@ -915,22 +1799,108 @@ NOTES
 
 Generated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
 """
-            
-            from io import BytesIO
-            buffer = BytesIO(text_content.encode('utf-8'))
-            
-            return StreamingResponse(
-                buffer,
-                media_type="text/plain",
-                headers={"Content-Disposition": f"attachment; filename=inspection_certificate_{appointment_id}.txt"}
-            )
-            
+        
+        buffer = BytesIO(text_content.encode('utf-8'))
+        
+        return StreamingResponse(
+            buffer,
+            media_type="text/plain",
+            headers={"Content-Disposition": f"attachment; filename=inspection_certificate_{appointment_id}.txt"}
+        )
+    
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"PDF generation error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate certificate: {str(e)}")
 
+@app.get("/inspections/certificates/bundle")
+async def export_certificate_bundle(
+    date_from: str,
+    date_to: str,
+    authorization: str = Header(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Stream a ZIP with the certificate of every inspection done between date_from
+    and date_to (YYYY-MM-DD, inclusive). Poll progress with the X-Bundle-Job-Id header.
+    """
+    try:
+        user = verify_token(authorization)
+        
+        if user.get("role") not in ["admin", "technician"]:
+            raise HTTPException(status_code=403, detail="Only admins and technicians can export certificates")
+        
+        if not REPORTLAB_AVAILABLE:
+            raise HTTPException(status_code=503, detail="PDF rendering is not available")
+        
+        try:
+            start = datetime.fromisoformat(date_from)
+            end = datetime.fromisoformat(date_to) + timedelta(days=1)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Expected: YYYY-MM-DD")
+        
+        result = await db.execute(
+            select(Inspection)
+            .where(Inspection.created_at >= start, Inspection.created_at < end)
+            .order_by(Inspection.created_at)
+        )
+        # Ordered oldest first so the latest inspection wins for an appointment
+        inspections = {str(inspection.appointment_id): inspection for inspection in result.scalars().all()}
+        
+        if len(inspections) > CERTIFICATE_BUNDLE_MAX_ITEMS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{len(inspections)} certificates in range, at most {CERTIFICATE_BUNDLE_MAX_ITEMS} per bundle"
+            )
+        
+        appointments = await local_appointments(db, list(inspections), authorization, user)
+        
+        items = []
+        for appointment_id, inspection in inspections.items():
+            vehicle_info = appointments.get(appointment_id, {}).get("vehicle_info") or {}
+            registration = str(vehicle_info.get("registration", "unknown")).replace("/", "-")
+            filename = f"{inspection.created_at.strftime('%Y-%m-%d')}/inspection_certificate_{registration}_{appointment_id}.pdf"
+            items.append((filename, certificate_fields(inspection), vehicle_info))
+        
+        job = CertificateBundleJob(len(items), user.get("email"))
+        track_bundle_job(job)
+        
+        await log_event("InspectionService", "certificates.bundle", "INFO",
+                      f"{user.get('email')} exported {len(items)} certificates from {date_from} to {date_to} (job {job.id})")
+        
+        return StreamingResponse(
+            stream_certificate_bundle(job, items, app.state.certificate_pool),
+            media_type="application/zip",
+            headers={
+                "Content-Disposition": f"attachment; filename=inspection_certificates_{date_from}_{date_to}.zip",
+                "X-Bundle-Job-Id": job.id
+            }
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Certificate bundle error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to export certificates: {str(e)}")
+
+@app.get("/inspections/certificates/bundle/{job_id}")
+async def get_certificate_bundle_progress(
+    job_id: str,
+    authorization: str = Header(...)
+):
+    """Progress of a certificate bundle export started by this worker"""
+    user = verify_token(authorization)
+    
+    if user.get("role") not in ["admin", "technician"]:
+        raise HTTPException(status_code=403, detail="Only admins and technicians can export certificates")
+    
+    job = bundle_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Bundle job not found")
+    
+    return job.to_dict()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8004)
\ No newline at end of file
@@ -0,0 +1,30 @@
+"""
+Inspection Statistics Rebuild
+inspection_daily_stats is updated by every submitted inspection and only built
+from scratch at startup while it is empty. Run this after changing inspections
+outside the service (manual SQL, restores) or when the statistics look wrong:
+it recounts the rollup from the inspections table.
+
+Submits wait for the rebuild to finish, so prefer a quiet moment.
+Uses the DB_* settings of the service (.env).
+Usage: python rebuild_inspection_stats.py
+"""
+
+import asyncio
+import sys
+
+import main
+
+async def rebuild_inspection_stats():
+    try:
+        await main.rebuild_inspection_daily_stats()
+    finally:
+        await main.engine.dispose()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(rebuild_inspection_stats())
+    except Exception as e:
+        print(f"\n✗ Rebuild failed: {e}")
+        sys.exit(1)
+    print("✓ Inspection statistics rebuilt")
@@ -0,0 +1,114 @@
+"""
+Certificates are served from the local appointment projection, which must not
+widen who can see an appointment: customers only get their own.
+Run from backend/inspection-service: python -m pytest tests
+"""
+
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+OWNER_ID = uuid.uuid4()
+OTHER_CUSTOMER_ID = uuid.uuid4()
+APPOINTMENT_ID = uuid.uuid4()
+
+USERS = {
+    "owner": {"user_id": str(OWNER_ID), "role": "customer", "email": "owner@test"},
+    "other": {"user_id": str(OTHER_CUSTOMER_ID), "role": "customer", "email": "other@test"},
+    "admin": {"user_id": str(uuid.uuid4()), "role": "admin", "email": "admin@test"},
+}
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def scalar_one_or_none(self):
+        return self.rows[0] if self.rows else None
+    
+    def scalars(self):
+        return self
+    
+    def all(self):
+        return self.rows
+
+class FakeSession:
+    """Answers the two selects the certificate endpoint runs, honouring their WHERE values"""
+    
+    def __init__(self, inspections, projections):
+        self.inspections = inspections
+        self.projections = projections
+    
+    async def execute(self, statement):
+        entity = statement.column_descriptions[0]["entity"]
+        params = statement.compile().params
+        if entity is main.Inspection:
+            return Result([i for i in self.inspections if i.appointment_id in params.values()])
+        ids = next(value for key, value in params.items() if key.startswith("appointment_id"))
+        owners = [value for key, value in params.items() if key.startswith("user_id")]
+        return Result([
+            p for p in self.projections
+            if p.appointment_id in ids and (not owners or p.user_id == owners[0])
+        ])
+
+@pytest.fixture
+def client(monkeypatch):
+    inspection = main.Inspection(
+        id=uuid.uuid4(),
+        appointment_id=APPOINTMENT_ID,
+        technician_id=uuid.uuid4(),
+        results={"brakes": "pass"},
+        final_status="passed",
+        notes=None,
+        created_at=datetime(2024, 5, 2, 10, 0)
+    )
+    projection = main.AppointmentProjection(
+        appointment_id=APPOINTMENT_ID,
+        user_id=OWNER_ID,
+        vehicle_info={"registration": "AB-123-CD", "brand": "Toyota", "model": "Corolla", "type": "car"},
+        appointment_date=datetime(2024, 5, 2, 9, 0),
+        status="completed",
+        inspection_status="passed",
+        created_at=datetime(2024, 5, 1, 8, 0),
+        updated_at=datetime(2024, 5, 2, 10, 0)
+    )
+    
+    async def fake_get_db():
+        yield FakeSession([inspection], [projection])
+    
+    fetched = []
+    
+    async def fake_fetch_appointments(appointment_ids, authorization):
+        # appointment-service's /appointments/batch filters by owner too, so a customer gets nothing back
+        fetched.extend(appointment_ids)
+        return {}
+    
+    monkeypatch.setattr(main, "verify_token", lambda token: USERS[token.removeprefix("Bearer ")])
+    monkeypatch.setattr(main, "fetch_appointments", fake_fetch_appointments)
+    monkeypatch.setattr(main, "REPORTLAB_AVAILABLE", False)
+    main.app.dependency_overrides[main.get_db] = fake_get_db
+    try:
+        yield TestClient(main.app)
+    finally:
+        main.app.dependency_overrides.clear()
+
+def certificate(client, who):
+    return client.get(f"/inspections/certificate/{APPOINTMENT_ID}", headers={"Authorization": f"Bearer {who}"})
+
+def test_owner_gets_their_certificate(client):
+    response = certificate(client, "owner")
+    assert response.status_code == 200
+    assert "AB-123-CD" in response.text
+
+def test_customer_cannot_get_another_customers_certificate(client):
+    response = certificate(client, "other")
+    assert response.status_code == 404
+    assert "AB-123-CD" not in response.text
+
+def test_staff_get_any_certificate(client):
+    response = certificate(client, "admin")
+    assert response.status_code == 200
+    assert "AB-123-CD" in response.text
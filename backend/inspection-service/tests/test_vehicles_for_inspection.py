@@ -0,0 +1,107 @@
+"""
+The technician vehicle list reads the appointment projection, which is empty or stale
+until this worker's first catch-up: until then it must ask appointment-service.
+Run from backend/inspection-service: python -m pytest tests
+"""
+
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+APPOINTMENT_ID = uuid.uuid4()
+
+UPSTREAM_PAGE = [{
+    "id": str(APPOINTMENT_ID),
+    "user_id": str(uuid.uuid4()),
+    "vehicle_info": {"registration": "AB-123-CD", "brand": "Toyota", "model": "Corolla", "type": "car"},
+    "status": "confirmed",
+    "payment_id": None,
+    "created_at": "2024-05-01T08:00:00",
+    "appointment_date": "2024-05-02T09:00:00"
+}]
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def scalars(self):
+        return self
+    
+    def all(self):
+        return self.rows
+
+class FakeSession:
+    """Empty inspections table; appointment_projections holds whatever the test puts there"""
+    
+    def __init__(self, projections):
+        self.projections = projections
+        self.projection_reads = 0
+    
+    async def execute(self, statement):
+        if statement.column_descriptions[0]["entity"] is main.AppointmentProjection:
+            self.projection_reads += 1
+            return Result(self.projections)
+        return Result([])
+
+@pytest.fixture
+def setup(monkeypatch):
+    session = FakeSession([])
+    upstream_calls = []
+    
+    async def fake_get_db():
+        yield session
+    
+    async def fake_fetch_appointment_page(skip, limit, authorization):
+        upstream_calls.append((skip, limit))
+        return UPSTREAM_PAGE
+    
+    async def fake_log_event(*args, **kwargs):
+        pass
+    
+    monkeypatch.setattr(main, "verify_token", lambda token: {"user_id": str(uuid.uuid4()), "role": "technician", "email": "tech@test"})
+    monkeypatch.setattr(main, "fetch_appointment_page", fake_fetch_appointment_page)
+    monkeypatch.setattr(main, "log_event", fake_log_event)
+    monkeypatch.setattr(main, "projection_sync", main.ProjectionSyncState())
+    main.app.dependency_overrides[main.get_db] = fake_get_db
+    try:
+        yield TestClient(main.app), session, upstream_calls
+    finally:
+        main.app.dependency_overrides.clear()
+
+def vehicles(client):
+    return client.get("/inspections/vehicles-for-inspection", headers={"Authorization": "Bearer test"})
+
+def test_lists_from_appointment_service_before_the_first_catch_up(setup):
+    client, session, upstream_calls = setup
+    
+    response = vehicles(client)
+    
+    assert response.status_code == 200
+    assert [v["appointment_id"] for v in response.json()["vehicles"]] == [str(APPOINTMENT_ID)]
+    assert upstream_calls == [(0, 100)]
+    assert session.projection_reads == 0
+
+def test_lists_from_the_projection_once_caught_up(setup):
+    client, session, upstream_calls = setup
+    main.projection_sync.last_catch_up_at = datetime.utcnow()
+    session.projections = [main.AppointmentProjection(
+        appointment_id=APPOINTMENT_ID,
+        user_id=uuid.uuid4(),
+        vehicle_info={"registration": "AB-123-CD", "brand": "Toyota", "model": "Corolla", "type": "car"},
+        appointment_date=datetime(2024, 5, 2, 9, 0),
+        status="confirmed",
+        inspection_status="not_checked",
+        created_at=datetime(2024, 5, 1, 8, 0),
+        updated_at=datetime(2024, 5, 1, 8, 0)
+    )]
+    
+    response = vehicles(client)
+    
+    assert response.status_code == 200
+    assert [v["appointment_id"] for v in response.json()["vehicles"]] == [str(APPOINTMENT_ID)]
+    assert upstream_calls == []
+    assert session.projection_reads == 1
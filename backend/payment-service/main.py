@@ -4,25 +4,26 @@ Port: 8003
 Database: payments_db
 """
 
-from fastapi import FastAPI, HTTPException, Header, BackgroundTasks, Depends
+from fastapi import FastAPI, HTTPException, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, validator
 import jwt
 import os
 from datetime import datetime, timedelta
-from typing import Optional, AsyncGenerator
+from typing import Optional, List, Tuple, AsyncGenerator
 import logging
 from dotenv import load_dotenv
 import httpx
 from enum import Enum
 import uuid
-import tenacity
+import asyncio
 from decimal import Decimal
 
 # SQLAlchemy imports
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column
-from sqlalchemy import String, DateTime, Numeric, select
+from sqlalchemy import String, DateTime, Numeric, Text, JSON, Integer, Index, select, update, delete, text
+from sqlalchemy.event import listen
 from sqlalchemy.dialects.postgresql import UUID
 
 load_dotenv()
@@ -42,6 +43,9 @@ DB_NAME = os.getenv("DB_NAME_PAYMENTS", "payments_db")
 LOGGING_SERVICE_URL = os.getenv("LOGGING_SERVICE_URL", "http://localhost:8005")
 APPOINTMENT_SERVICE_URL = os.getenv("APPOINTMENT_SERVICE_URL", "http://localhost:8002")
 
+# Upper bound on IDs accepted by batch lookups
+MAX_BATCH_SIZE = 500
+
 # SQLAlchemy Database URL
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
@@ -96,6 +100,15 @@ class PaymentConfirm(BaseModel):
     status: str = "confirmed"
     transaction_id: Optional[str] = None
 
+class PaymentBatchRequest(BaseModel):
+    payment_ids: List[str]
+    
+    @validator("payment_ids")
+    def batch_size_valid(cls, v):
+        if len(v) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} payment IDs per request")
+        return v
+
 # ============= DATABASE MODELS & CONNECTION =============
 Base = declarative_base()
 
@@ -113,6 +126,24 @@ class Payment(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class OutboxMessage(Base):
+    """Appointment confirmation recorded in the same transaction as the payment; deleted once delivered"""
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        # Dispatcher scan: pending confirmations that are due
+        Index("ix_outbox_messages_due", "next_attempt_at", postgresql_where=text("status = 'pending'")),
+    )
+    
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    method: Mapped[str] = mapped_column(String(10), nullable=False)
+    path: Mapped[str] = mapped_column(String(500), nullable=False)  # Relative to APPOINTMENT_SERVICE_URL
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")  # pending or failed
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+
 # SQLAlchemy Engine and Session
 engine = create_async_engine(
     DATABASE_URL,
@@ -176,35 +207,147 @@ def verify_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-@tenacity.retry(
-    wait=tenacity.wait_exponential(multiplier=1, min=2, max=10),
-    stop=tenacity.stop_after_attempt(3),
-    reraise=True
-)
-async def update_appointment_status(appointment_id: str, payment_id: str, token: str):
-    """Update appointment status in Appointment Service with retry"""
-    async with httpx.AsyncClient(timeout=10) as client:
-        response = await client.put(
-            f"{APPOINTMENT_SERVICE_URL}/appointments/{appointment_id}/confirm",
-            json={"payment_id": payment_id},
-            headers={"Authorization": f"Bearer {token}"}
+def payment_to_dict(payment: "Payment") -> dict:
+    """Full payment representation returned by lookups"""
+    return {
+        "id": str(payment.id),
+        "appointment_id": str(payment.appointment_id),
+        "user_id": str(payment.user_id),
+        "amount": float(payment.amount),
+        "status": payment.status,
+        "payment_type": payment.payment_type,
+        "invoice_number": payment.invoice_number,
+        "transaction_id": payment.transaction_id,
+        "created_at": payment.created_at.isoformat(),
+        "updated_at": payment.updated_at.isoformat()
+    }
+
+def service_token() -> str:
+    """Bearer token for this service's own calls to appointment-service (role "service", no user)"""
+    payload = {
+        "user_id": "payment-service",
+        "email": "payment-service",
+        "role": "service",
+        "exp": datetime.utcnow() + timedelta(hours=1)
+    }
+    return f"Bearer {jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)}"
+
+# ============= OUTBOX =============
+# Appointment confirmations are written in the payment's transaction and sent to appointment-service
+# after it commits. A trimmed copy of inspection-service's outbox, kept here on purpose so each service
+# builds and deploys on its own: confirming is idempotent, so there is no per-appointment ordering,
+# and delivered rows are deleted instead of kept.
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "15"))
+OUTBOX_MAX_BACKOFF_SECONDS = 600
+# How long a claimed confirmation is left to the dispatcher sending it
+OUTBOX_CLAIM_SECONDS = 60
+# 4xx statuses worth retrying; 401 means our own service token is misconfigured
+OUTBOX_RETRYABLE_STATUSES = {408, 409, 425, 429}
+
+outbox_wakeup = asyncio.Event()
+
+def enqueue_appointment_confirmation(db: AsyncSession, appointment_id: uuid.UUID, payment_id: str):
+    """Queue PUT /appointments/{id}/confirm in the caller's transaction"""
+    db.add(OutboxMessage(method="PUT", path=f"/appointments/{appointment_id}/confirm", payload={"payment_id": payment_id}))
+    listen(db.sync_session, "after_commit", lambda session: outbox_wakeup.set(), once=True)
+
+async def deliver_outbox_message(client: httpx.AsyncClient, message: OutboxMessage, token: str) -> Tuple[Optional[str], bool]:
+    """(error or None, retryable)"""
+    try:
+        response = await client.request(
+            message.method,
+            f"{APPOINTMENT_SERVICE_URL}{message.path}",
+            json=message.payload,
+            headers={"Authorization": token}
         )
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail="Failed to confirm appointment")
-        
-        return response.json()
+    except httpx.HTTPError as e:
+        return f"{type(e).__name__}: {e}", True
+    if response.status_code < 300:
+        return None, False
+    error = f"HTTP {response.status_code}: {response.text[:200]}"
+    return error, response.status_code >= 500 or response.status_code in OUTBOX_RETRYABLE_STATUSES
+
+async def claim_outbox_batch() -> List[OutboxMessage]:
+    """Due confirmations, claimed for OUTBOX_CLAIM_SECONDS in a transaction of their own"""
+    async with async_session_maker() as session:
+        async with session.begin():
+            result = await session.execute(
+                select(OutboxMessage)
+                .where(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= datetime.utcnow())
+                .order_by(OutboxMessage.next_attempt_at)
+                .limit(OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            messages = result.scalars().all()
+            claimed_until = datetime.utcnow() + timedelta(seconds=OUTBOX_CLAIM_SECONDS)
+            for message in messages:
+                message.attempts += 1
+                message.next_attempt_at = claimed_until
+    return messages
+
+async def dispatch_outbox_batch(client: httpx.AsyncClient) -> int:
+    """Send one batch of claimed confirmations and record the results; returns how many were attempted"""
+    messages = await claim_outbox_batch()
+    if not messages:
+        return 0
+    
+    token = service_token()
+    outcomes = await asyncio.gather(*(deliver_outbox_message(client, message, token) for message in messages))
+    
+    now = datetime.utcnow()
+    given_up = []
+    async with async_session_maker() as session:
+        async with session.begin():
+            for message, (error, retryable) in zip(messages, outcomes):
+                # Matching attempts: skip rows whose claim lapsed and were claimed again
+                claimed = (OutboxMessage.id == message.id, OutboxMessage.attempts == message.attempts)
+                if error is None:
+                    await session.execute(delete(OutboxMessage).where(*claimed))
+                    continue
+                if retryable and message.attempts < OUTBOX_MAX_ATTEMPTS:
+                    backoff = timedelta(seconds=min(OUTBOX_MAX_BACKOFF_SECONDS, 2 ** message.attempts))
+                    await session.execute(update(OutboxMessage).where(*claimed).values(next_attempt_at=now + backoff, last_error=error))
+                    logger.warning(f"Confirming via {message.path} failed (attempt {message.attempts}): {error}")
+                    continue
+                await session.execute(update(OutboxMessage).where(*claimed).values(status="failed", last_error=error))
+                given_up.append(f"{message.method} {message.path} given up after {message.attempts} attempts: {error}")
+    
+    for failure in given_up:
+        logger.error(f"Outbox {failure}")
+        await log_event("PaymentService", "outbox.failed", "ERROR", failure)
+    return len(messages)
+
+async def run_outbox_dispatcher():
+    """Send confirmations right after the payment commits, and retry due ones every OUTBOX_POLL_SECONDS"""
+    async with httpx.AsyncClient(timeout=10) as client:
+        while True:
+            try:
+                outbox_wakeup.clear()
+                if await dispatch_outbox_batch(client) == OUTBOX_BATCH_SIZE:
+                    continue  # Probably more due right now
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Outbox dispatch error: {e}")
+            try:
+                await asyncio.wait_for(outbox_wakeup.wait(), timeout=OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
 
 # ============= EVENTS =============
 @app.on_event("startup")
 async def startup():
     logger.info("Starting Payment Service...")
     await init_db()
+    app.state.outbox_task = asyncio.create_task(run_outbox_dispatcher())
     logger.info("✓ Payment Service started successfully")
 
 @app.on_event("shutdown")
 async def shutdown():
     logger.info("Shutting down Payment Service...")
+    app.state.outbox_task.cancel()
     await engine.dispose()
     logger.info("✓ Database connections closed")
 
@@ -217,7 +360,6 @@ async def health_check():
 async def create_payment(
     request: PaymentRequest,
     authorization: str = Header(...),
-    background_tasks: BackgroundTasks = None,
     db: AsyncSession = Depends(get_db)
 ):
     """Initiate payment for appointment"""
@@ -266,7 +408,6 @@ async def create_payment(
 @app.post("/payment/confirm")
 async def confirm_payment(
     payment_data: PaymentConfirm,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """Confirm payment (webhook/callback from payment gateway)"""
@@ -286,14 +427,9 @@ async def confirm_payment(
         payment.updated_at = datetime.utcnow()
         await db.flush()
         
-        # Asynchronously confirm appointment (don't block payment confirmation)
+        # Confirm the appointment through the outbox (don't block payment confirmation)
         if payment_data.status == "confirmed":
-            background_tasks.add_task(
-                confirm_appointment_async,
-                str(payment.appointment_id),
-                payment_data.payment_id,
-                user_id=str(payment.user_id)
-            )
+            enqueue_appointment_confirmation(db, payment.appointment_id, payment_data.payment_id)
         
         await log_event("PaymentService", "payment.confirmed", "INFO",
                       f"Payment {payment_data.payment_id} confirmed with transaction {payment_data.transaction_id}")
@@ -311,26 +447,33 @@ async def confirm_payment(
         await log_event("PaymentService", "payment.confirm_error", "ERROR", str(e))
         raise HTTPException(status_code=500, detail="Failed to confirm payment")
 
-async def confirm_appointment_async(appointment_id: str, payment_id: str, user_id: str):
-    """Background task to confirm appointment"""
+@app.post("/payment/batch")
+async def get_payments_batch(
+    batch: PaymentBatchRequest,
+    authorization: str = Header(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get many payments by ID in one call; unknown IDs are simply absent from the result"""
     try:
-        # Generate service token (in production, use service-to-service auth)
-        service_token = jwt.encode(
-            {
-                "sub": "payment-service",
-                "exp": datetime.utcnow() + timedelta(hours=1)
-            },
-            JWT_SECRET_KEY,
-            algorithm=JWT_ALGORITHM
-        )
+        verify_token(authorization)
+        
+        try:
+            payment_ids = {uuid.UUID(pid) for pid in batch.payment_ids}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid payment ID")
         
-        await update_appointment_status(appointment_id, payment_id, service_token)
-        logger.info(f"✓ Appointment {appointment_id} confirmed")
+        payments = {}
+        if payment_ids:
+            result = await db.execute(select(Payment).where(Payment.id.in_(payment_ids)))
+            payments = {str(p.id): payment_to_dict(p) for p in result.scalars().all()}
         
+        return {"payments": payments}
+    
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Failed to confirm appointment: {e}")
-        await log_event("PaymentService", "appointment.confirm_failed", "ERROR",
-                      f"Failed to confirm appointment {appointment_id}: {str(e)}")
+        logger.error(f"Get payments batch error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve payments")
 
 @app.get("/payment/status/{payment_id}")
 async def get_payment_status(
@@ -383,18 +526,7 @@ async def get_payment(
         if not payment:
             raise HTTPException(status_code=404, detail="Payment not found")
         
-        return {
-            "id": str(payment.id),
-            "appointment_id": str(payment.appointment_id),
-            "user_id": str(payment.user_id),
-            "amount": float(payment.amount),
-            "status": payment.status,
-            "payment_type": payment.payment_type,
-            "invoice_number": payment.invoice_number,
-            "transaction_id": payment.transaction_id,
-            "created_at": payment.created_at.isoformat(),
-            "updated_at": payment.updated_at.isoformat()
-        }
+        return payment_to_dict(payment)
             
     except HTTPException:
         raise
@@ -440,31 +572,8 @@ async def confirm_payment_simulated(
         await log_event("PaymentService", "payment.confirmed", "INFO",
                       f"User {user.get('email')} confirmed payment {payment_id} (SIMULATED) at {datetime.utcnow().isoformat()}")
         
-        # Confirm appointment automatically
-        try:
-            # Generate service token for inter-service communication
-            service_token = jwt.encode(
-                {
-                    "sub": "payment-service",
-                    "user_id": str(payment.user_id),
-                    "role": "service",
-                    "exp": datetime.utcnow() + timedelta(hours=1)
-                },
-                JWT_SECRET_KEY,
-                algorithm=JWT_ALGORITHM
-            )
-            
-            await update_appointment_status(
-                str(payment.appointment_id),
-                str(payment.id),
-                service_token
-            )
-            await log_event("PaymentService", "appointment.auto_confirmed", "INFO",
-                          f"Appointment {payment.appointment_id} auto-confirmed after payment {payment_id}")
-        except Exception as e:
-            logger.error(f"Failed to confirm appointment: {e}")
-            await log_event("PaymentService", "appointment.confirm_failed", "ERROR",
-                          f"Failed to confirm appointment {payment.appointment_id}: {str(e)}")
+        # Confirm appointment automatically - sent by the outbox dispatcher once this commits
+        enqueue_appointment_confirmation(db, payment.appointment_id, str(payment.id))
         
         return {
             "message": "Payment confirmed successfully (SIMULATED)",